@@ -1,72 +1,626 @@
-import google.generativeai as genai
-import os
+import asyncio
+import copy
 import json
+import orjson
 import re
-from typing import Dict, Any, Optional
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Set, Tuple
+from src import cache as result_cache
+from src.llm_client import get_gemini
 from src.models.data_models import ExtractedData
 
+try:
+    import re2  # Optional DFA regex engine (pip install google-re2)
+except ImportError:
+    re2 = None
+
+try:
+    import tiktoken  # Optional local tokenizer for prompt truncation
+except ImportError:
+    tiktoken = None
+
+# Token budget for the document text sent with each LLM prompt. Counted with
+# cl100k_base, which only approximates Gemini's tokenizer, so it is a soft limit
+MAX_INPUT_TOKENS = 2048
+
+def compile_pattern(pattern: str, flags: int = 0, fallback_pattern: Optional[str] = None):
+    """
+    Compile a document-scanning pattern, preferring RE2 when it is installed.
+    
+    RE2 matches in linear time instead of backtracking but has a fixed
+    per-call cost, so use it for patterns that walk the whole document
+    (findall, DOTALL spans) rather than first-hit searches. Patterns RE2
+    cannot compile fall back to the standard re module. Note that RE2's
+    digit, word and whitespace classes are ASCII-only.
+    
+    fallback_pattern, if given, is an equivalent form used with re instead,
+    e.g. with lookbehind anchors that only help a backtracking engine.
+    """
+    if re2 is not None:
+        inline_flags = ('i' if flags & re.IGNORECASE else '') + ('s' if flags & re.DOTALL else '')
+        try:
+            return re2.compile(f'(?{inline_flags}){pattern}' if inline_flags else pattern)
+        except re2.error:
+            pass
+    return re.compile(fallback_pattern or pattern, flags)
+
+def fold_for_keywords(text: str) -> Optional[str]:
+    """
+    Casefold text so `keyword in folded` agrees with an re.IGNORECASE search
+    for a lowercase ASCII keyword.
+    
+    Returns None if text has a dotted or dotless I, which IGNORECASE matches
+    to 'i' but casefold does not; callers then skip the presence check.
+    """
+    if '\u0130' in text or '\u0131' in text:
+        return None
+    return text.casefold()
+
+def may_match(folded_text: Optional[str], keywords: tuple) -> bool:
+    """
+    Whether a pattern that needs one of keywords (lowercase ASCII) can match.
+
+    Patterns without keywords, or text that could not be folded, are always
+    scanned.
+    """
+    if not keywords or folded_text is None:
+        return True
+    return any(keyword in folded_text for keyword in keywords)
+
+@lru_cache(maxsize=1)
+def _get_token_encoding():
+    """Load the tokenizer once, or return None if it is unavailable."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"Tokenizer load failed, truncating by characters: {e!r}")
+        return None
+
+def truncate_to_tokens(text: str, max_tokens: int = MAX_INPUT_TOKENS) -> str:
+    """
+    Truncate text to at most max_tokens tokens.
+    
+    Tokens are counted with tiktoken's cl100k_base encoding, which only
+    approximates Gemini's own tokenizer, so max_tokens is a soft budget rather
+    than an exact limit on what Gemini counts. Falls back to about four
+    characters per token when no tokenizer is available.
+    
+    Encoding up to max_tokens * 16 characters is CPU-bound; async callers should
+    run this in an executor.
+    """
+    encoding = _get_token_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    
+    # Tokenize a generous prefix first so long documents are not encoded in full
+    prefix = text[:max_tokens * 16]
+    token_ids = encoding.encode(prefix, disallowed_special=())
+    if len(token_ids) <= max_tokens:
+        if len(prefix) == len(text):
+            return text
+        token_ids = encoding.encode(text, disallowed_special=())
+        if len(token_ids) <= max_tokens:
+            return text
+    return encoding.decode(token_ids[:max_tokens])
+
+# Claim whose documents the current task is extracting, set by ClaimProcessor.
+# Tasks started for the claim's documents inherit it
+current_claim_id: ContextVar[Optional[str]] = ContextVar('current_claim_id', default=None)
+
+class GeminiBatcher:
+    """
+    Collects concurrent LLM prompts and dispatches them together.
+    
+    Prompts submitted within a short window (or until the batch is full) are
+    flushed as one batch, so documents arriving together share the wait on the
+    Gemini API instead of queueing behind each other. Prompts in a batch for the
+    same claim and model are packed into combined requests of up to
+    max_prompts_per_request prompts, saving round trips for the documents of one
+    claim. Prompts of different claims, or submitted outside a claim, never
+    share a request, so no patient's documents reach the model alongside
+    another's. Each combined answer must still echo its request's random key
+    before it is handed back to that request's caller.
+    """
+    
+    # Bounded pool for SDK versions without generate_content_async
+    _executor = ThreadPoolExecutor(max_workers=16)
+    
+    def __init__(self, max_batch_size: int = 32, max_wait_ms: float = 20,
+                 max_prompts_per_request: int = 4):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_prompts_per_request = max_prompts_per_request
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+    
+    async def submit(self, model, prompt: str) -> str:
+        """
+        Queue a prompt for the next batch and wait for the response text.
+        
+        The prompt may be combined with others of the claim in current_claim_id.
+        """
+        self._ensure_flusher()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((model, prompt, future, current_claim_id.get()))
+        return await future
+    
+    def _ensure_flusher(self):
+        """Start the background flusher on the running event loop if needed."""
+        if self._flusher_task is None or self._flusher_task.done():
+            self._queue = asyncio.Queue()
+            self._flusher_task = asyncio.get_running_loop().create_task(self._flusher())
+    
+    async def _flusher(self):
+        """Drain the queue into batches of up to max_batch_size prompts."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Dispatch without blocking the next batch from forming
+            task = loop.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+    
+    async def _dispatch(self, batch: List[Tuple[Any, str, asyncio.Future, Optional[str]]]):
+        """Group a batch by claim and model and send each group as combined requests."""
+        groups: Dict[Tuple[Optional[str], int], List[Tuple[Any, str, asyncio.Future]]] = {}
+        for model, prompt, future, claim_id in batch:
+            # A prompt outside any claim gets a group of its own
+            group_key = (claim_id, id(model)) if claim_id is not None else (None, id(future))
+            groups.setdefault(group_key, []).append((model, prompt, future))
+        
+        size = self.max_prompts_per_request
+        await asyncio.gather(*(
+            self._dispatch_group(group[i:i + size])
+            for group in groups.values()
+            for i in range(0, len(group), size)
+        ))
+    
+    async def _dispatch_group(self, group: List[Tuple[Any, str, asyncio.Future]]):
+        """Send prompts for one model in a single request and resolve each caller's future."""
+        model = group[0][0]
+        prompts = [prompt for _, prompt, _ in group]
+        if len(prompts) == 1:
+            results = await asyncio.gather(self._generate(model, prompts[0]), return_exceptions=True)
+        else:
+            results = await self._generate_combined(model, prompts)
+        
+        for (_, _, future), result in zip(group, results):
+            if future.done():
+                continue  # Caller was cancelled
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+    
+    async def _generate_combined(self, model, prompts: List[str]) -> List[Any]:
+        """
+        Answer several prompts with one request.
+        
+        Returns each prompt's answer as JSON text, or an exception. Prompts whose
+        answer is missing from the combined response, or does not echo the
+        prompt's request key, are sent on their own.
+        """
+        # Unique, unguessable keys, so an answer filed under or echoing the
+        # wrong request is caught rather than given to another document
+        keys = [f"{i}-{secrets.token_hex(4)}" for i in range(len(prompts))]
+        answers: Dict[str, Any] = {}
+        try:
+            response_text = await self._generate(model, _combined_prompt(prompts, keys))
+            start = response_text.find('{')
+            end = response_text.rfind('}')
+            if start != -1 and end > start:
+                answers = orjson.loads(response_text[start:end + 1])
+        except Exception as e:
+            print(f"Combined LLM request failed, sending prompts separately: {e}")
+        
+        if not isinstance(answers, dict):
+            answers = {}
+        results: List[Any] = [None] * len(prompts)
+        missing = []
+        for i, key in enumerate(keys):
+            answer = answers.get(key)
+            if isinstance(answer, dict) and answer.pop(_REQUEST_KEY_FIELD, None) == key:
+                results[i] = orjson.dumps(answer).decode()
+            else:
+                missing.append(i)
+        
+        retried = await asyncio.gather(
+            *(self._generate(model, prompts[i]) for i in missing),
+            return_exceptions=True
+        )
+        for i, result in zip(missing, retried):
+            results[i] = result
+        return results
+    
+    async def _generate(self, model, prompt: str) -> str:
+        """Run one prompt without blocking the event loop."""
+        if hasattr(model, 'generate_content_async'):
+            return await self._generate_streamed(model, prompt)
+        
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self._executor, model.generate_content, prompt)
+        return response.text
+    
+    async def _generate_streamed(self, model, prompt: str) -> str:
+        """
+        Stream a response, stopping as soon as it holds a complete JSON object.
+        """
+        response = await model.generate_content_async(prompt, stream=True)
+        parts = []
+        async for chunk in response:
+            try:
+                parts.append(chunk.text)
+            except ValueError:
+                continue  # Chunk without text, e.g. only a finish reason
+            
+            if '}' in parts[-1]:
+                text = ''.join(parts)
+                json_end = _complete_json_end(text)
+                if json_end is not None:
+                    return text[:json_end]
+        
+        return ''.join(parts)
+
+# Field each combined answer must carry, repeating its request's key
+_REQUEST_KEY_FIELD = 'request_key'
+
+_COMBINED_PROMPT_HEADER = (
+    "Answer each request below independently, using only the document text given "
+    "in that request. Return only one JSON object whose keys are the request keys "
+    "and whose values are the JSON objects the requests ask for, each with an added "
+    f"\"{_REQUEST_KEY_FIELD}\" field set to that request's key, no additional text.\n"
+)
+
+def _combined_prompt(prompts: List[str], keys: List[str]) -> str:
+    """Pack several extraction prompts into one request, each under its key."""
+    sections = [_COMBINED_PROMPT_HEADER]
+    for key, prompt in zip(keys, prompts):
+        sections.append(f"\n=== Request {key} ===\n{prompt}\n")
+    return ''.join(sections)
+
+def _complete_json_end(text: str) -> Optional[int]:
+    """Return where the first JSON object in text ends, if it is complete."""
+    start = text.find('{')
+    if start == -1:
+        return None
+    try:
+        _, end = _JSON_DECODER.raw_decode(text, start)
+    except ValueError:
+        return None
+    return end
+
+_JSON_DECODER = json.JSONDecoder()
+_gemini_batcher = GeminiBatcher()
+
+# Rule-based results at or above this confidence skip the LLM entirely
+RULE_CONFIDENCE_THRESHOLD = 0.85
+
+# Bump when prompts or extraction rules change, to invalidate cached results
+PROMPT_VERSION = "2"
+
+LARGE_MODEL_NAME = 'gemini-pro'
+SMALL_MODEL_NAME = 'gemini-1.5-flash'
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Date forms accepted by _normalize_date; the separator must not change mid-date
+_DAY_FIRST_DATE_RE = re.compile(r'(\d{1,2})([/-])(\d{1,2})\2(\d{4})')
+_YEAR_FIRST_DATE_RE = re.compile(r'(\d{4})([/-])(\d{1,2})\2(\d{1,2})')
+_VERBAL_DATE_RE = re.compile(r'(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})')
+
+_MONTHS = {
+    'jan': 1, 'january': 1, 'feb': 2, 'february': 2, 'mar': 3, 'march': 3,
+    'apr': 4, 'april': 4, 'may': 5, 'jun': 6, 'june': 6, 'jul': 7, 'july': 7,
+    'aug': 8, 'august': 8, 'sep': 9, 'sept': 9, 'september': 9,
+    'oct': 10, 'october': 10, 'nov': 11, 'november': 11, 'dec': 12, 'december': 12
+}
+
+# Date formats searched for after a keyword, in priority order
+_DATE_PATTERNS = [
+    r'(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
+    r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})',
+    r'(\d{1,2}\s+\w+\s+\d{4})'
+]
+
+def keyword_date_patterns(keywords: List[str]) -> tuple:
+    """
+    Compile one (keyword, pattern) pair per keyword, the pattern matching the
+    keyword followed by any date format.
+    
+    The date formats are groups 1..len(_DATE_PATTERNS) in priority order, so
+    match.lastindex tells which format matched.
+    """
+    date_alternation = '|'.join(_DATE_PATTERNS)
+    return tuple(
+        (keyword, re.compile(rf'{keyword}[:\s]*(?:{date_alternation})', re.IGNORECASE))
+        for keyword in keywords
+    )
+
 class BaseAgent:
     """
     Base class for all document processing agents.
     """
     
+    # Exact-match cache of parsed LLM responses, shared by all agents (LRU).
+    # Entries are (expires_at, result) and live as long as persisted ones
+    _response_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    _response_cache_size = 4096
+    
     def __init__(self, agent_type: str):
         self.agent_type = agent_type
+        self.model = self._get_model(LARGE_MODEL_NAME)
+        self.small_model = self._get_model(SMALL_MODEL_NAME)
+    
+    @classmethod
+    def _get_model(cls, model_name: str):
+        """
+        Return the shared Gemini model, or None if no API key is configured.
+        """
+        return get_gemini(model_name)
+    
+    @classmethod
+    async def prewarm(cls):
+        """
+        Open the Gemini connection ahead of the first claim.
         
-        # Configure Gemini API
-        api_key = os.getenv('GEMINI_API_KEY', 'your-api-key-here')
-        if api_key != 'your-api-key-here':
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
-        else:
-            self.model = None
+        All models share the SDK's default async client, so one count_tokens
+        call (not billed as a generation) warms the channel for every agent.
+        The prompt tokenizer is loaded too, since the first load may download
+        its BPE file.
+        """
+        model = cls._get_model(LARGE_MODEL_NAME)
+        if model is None:
+            return
+        await asyncio.get_running_loop().run_in_executor(None, _get_token_encoding)
+        try:
+            # Bounded so an unreachable API does not hold up startup
+            await asyncio.wait_for(model.count_tokens_async("ping"), timeout=10)
+        except Exception as e:
+            print(f"Gemini prewarm failed: {e!r}")
     
-    async def extract_data(self, text_content: str) -> ExtractedData:
+    async def extract_data(self, text_content: str, cleaned_text: Optional[str] = None) -> ExtractedData:
         """
         Extract structured data from text content.
         This method should be overridden by subclasses.
+        
+        cleaned_text, if given, is clean_text(text_content) computed by the caller.
         """
         raise NotImplementedError("Subclasses must implement extract_data method")
     
+    async def extract_data_cached(self, text_content: str, cleaned_text: Optional[str] = None) -> ExtractedData:
+        """
+        Extract structured data, reusing a persisted result for identical text.
+        
+        Only results at or above RULE_CONFIDENCE_THRESHOLD are persisted. Below it
+        the rules fell short and the LLM did not make up for it, possibly because
+        it failed or no API key is set, and a retry may do better. LLM answers
+        that did arrive are cached on their own by _llm_extract.
+        """
+        key = result_cache.make_key(self.agent_type, PROMPT_VERSION, text_content)
+        cached = await result_cache.get(key)
+        if cached is not None:
+            # The entry was dumped from an ExtractedData, so skip re-validating it
+            return ExtractedData.model_construct(**cached, raw_text=text_content)
+        
+        extracted = await self.extract_data(text_content, cleaned_text)
+        if extracted.extraction_confidence >= RULE_CONFIDENCE_THRESHOLD:
+            await result_cache.set(key, extracted.model_dump(exclude={'raw_text'}))
+        return extracted
+    
     def _extract_json_from_response(self, response_text: str) -> Optional[Dict[str, Any]]:
         """
         Extract JSON from LLM response text.
         """
         try:
-            # Try to find JSON in the response
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                return json.loads(json_str)
+            # Try to find JSON in the response: first '{' through last '}'
+            start = response_text.find('{')
+            end = response_text.rfind('}')
+            if start != -1 and end > start:
+                json_str = response_text[start:end + 1]
+                return orjson.loads(json_str)
             else:
                 # If no JSON found, try to parse the entire response
-                return json.loads(response_text)
-        except json.JSONDecodeError:
+                return orjson.loads(response_text)
+        except orjson.JSONDecodeError:
             print(f"Failed to parse JSON from response: {response_text}")
             return None
     
-    def _clean_text_for_processing(self, text: str) -> str:
+    def _normalize_date(self, date_str: str) -> Optional[str]:
+        """
+        Normalize date to YYYY-MM-DD format.
+        
+        Accepts DD/MM/YYYY (then MM/DD/YYYY), DD-MM-YYYY, YYYY-MM-DD,
+        YYYY/MM/DD and "12 March 2024" forms.
+        """
+        # Fast path for dates already in YYYY-MM-DD form
+        if len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-':
+            try:
+                return date.fromisoformat(date_str).isoformat()
+            except ValueError:
+                pass  # Leave it to the general parser below
+        
+        match = _DAY_FIRST_DATE_RE.fullmatch(date_str)
+        if match:
+            first, separator, second, year = match.groups()
+            candidates = [(year, second, first)]
+            if separator == '/':
+                candidates.append((year, first, second))
+        elif (match := _YEAR_FIRST_DATE_RE.fullmatch(date_str)):
+            year, _, month, day = match.groups()
+            candidates = [(year, month, day)]
+        elif (match := _VERBAL_DATE_RE.fullmatch(date_str)):
+            day, month_name, year = match.groups()
+            month = _MONTHS.get(month_name.lower())
+            if month is None:
+                return None
+            candidates = [(year, month, day)]
+        else:
+            return None
+        
+        for year, month, day in candidates:
+            try:
+                return date(int(year), int(month), int(day)).isoformat()
+            except ValueError:
+                continue
+        
+        return None
+    
+    def _extract_date_pattern(self, text: str, patterns: tuple,
+                              folded_text: Optional[str] = None) -> Optional[str]:
+        """
+        Extract the date that follows one of the keywords, from
+        keyword_date_patterns() pairs.
+        
+        Keywords are tried in order; for each, the match in the earliest date
+        format wins, and the first keyword with a match decides the result.
+        """
+        # Look for keyword followed by date, preferring earlier date formats
+        for keyword, pattern in patterns:
+            # Skip the scan when the keyword is not in the text at all
+            if folded_text is not None and keyword not in folded_text:
+                continue
+            
+            best_match = None
+            match = pattern.search(text)
+            while match:
+                if best_match is None or match.lastindex < best_match.lastindex:
+                    best_match = match
+                    if match.lastindex == 1:
+                        break
+                # A verbal date such as "5 admit 2024" can swallow the next keyword,
+                # so only resume right after the keyword in that case
+                if match.lastindex == len(_DATE_PATTERNS):
+                    match = pattern.search(text, match.start() + 1)
+                else:
+                    match = pattern.search(text, match.end())
+            
+            if best_match:
+                date_str = best_match.group(best_match.lastindex)
+                return self._normalize_date(date_str)
+        
+        return None
+    
+    @staticmethod
+    def clean_text(text: str) -> str:
         """
         Clean text for better LLM processing.
         """
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         # Remove special characters that might interfere with JSON parsing
         text = text.replace('\x00', '')
         return text.strip()
     
-    async def _llm_extract(self, prompt: str, text_content: str) -> Optional[Dict[str, Any]]:
+    async def _routed_llm_extract(self, prompt: str, text_content: str,
+                                  rule_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Fill in what the rule-based extraction missed, using the cheapest model that can.
+        
+        The small model is asked for the missing fields only; the large model
+        and the full prompt are used when that still leaves the confidence low.
+        """
+        missing_fields = [key for key, value in rule_data.items() if not value]
+        
+        small_data = None
+        if self.small_model is not None and missing_fields:
+            small_data = await self._llm_extract(
+                self._missing_fields_prompt(missing_fields), text_content, self.small_model
+            )
+            if small_data is not None:
+                combined = self._combine_extraction_results(small_data, rule_data)
+                if self._calculate_confidence(combined, text_content) >= RULE_CONFIDENCE_THRESHOLD:
+                    return small_data
+        
+        # Escalate to the large model
+        large_data = await self._llm_extract(prompt, text_content)
+        return large_data if large_data is not None else small_data
+    
+    def _missing_fields_prompt(self, missing_fields: List[str]) -> str:
+        """Build a prompt asking only for the given fields."""
+        document_name = self.agent_type.replace('_', ' ')
+        return f"""
+        Extract the following fields from this {document_name} and return them as a JSON object
+        with exactly these keys: {', '.join(missing_fields)}
+        
+        If any field is not found, use null. For dates, use YYYY-MM-DD format.
+        Return only the JSON object, no additional text.
+        """
+    
+    async def _llm_extract(self, prompt: str, text_content: str, model=None) -> Optional[Dict[str, Any]]:
         """
         Use LLM to extract data based on a prompt.
         """
-        if self.model is None:
+        model = model or self.model
+        if model is None:
             return None
         
+        # Tokenizing runs off the event loop, as does the tokenizer's first load
+        document_text = await asyncio.get_running_loop().run_in_executor(None, truncate_to_tokens, text_content)
+        full_prompt = f"{prompt}\n\nDocument text:\n{document_text}"
+        model_name = getattr(model, 'model_name', '')
+        cache_key = result_cache.make_key('llm', self.agent_type, PROMPT_VERSION, model_name, full_prompt)
+        
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Fall back to the persistent cache, shared across restarts and workers
+        cached = await result_cache.get(cache_key)
+        if cached is not None:
+            self._cache_response(cache_key, cached)
+            return cached
+        
         try:
-            full_prompt = f"{prompt}\n\nDocument text:\n{text_content[:4000]}"
-            response = self.model.generate_content(full_prompt)
-            return self._extract_json_from_response(response.text)
+            response_text = await _gemini_batcher.submit(model, full_prompt)
+            result = self._extract_json_from_response(response_text)
         except Exception as e:
             print(f"Error in LLM extraction: {e}")
             return None
+        
+        if result is not None:
+            self._cache_response(cache_key, result)
+            await result_cache.set(cache_key, result)
+        return result
+    
+    @classmethod
+    def _get_cached_response(cls, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a cached LLM response, if present and not expired."""
+        entry = cls._response_cache.get(cache_key)
+        if entry is None:
+            return None
+        expires_at, cached = entry
+        if expires_at <= time.monotonic():
+            del cls._response_cache[cache_key]
+            return None
+        cls._response_cache.move_to_end(cache_key)
+        return copy.deepcopy(cached)
+    
+    @classmethod
+    def _cache_response(cls, cache_key: str, result: Dict[str, Any]):
+        """Store a parsed LLM response, evicting the least recently used entry."""
+        expires_at = time.monotonic() + result_cache.DEFAULT_TTL
+        cls._response_cache[cache_key] = (expires_at, copy.deepcopy(result))
+        cls._response_cache.move_to_end(cache_key)
+        if len(cls._response_cache) > cls._response_cache_size:
+            cls._response_cache.popitem(last=False)
 
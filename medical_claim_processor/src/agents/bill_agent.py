@@ -1,9 +1,68 @@
+import asyncio
 import re
-from datetime import datetime
 from typing import Dict, Any, Optional
-from src.agents.base_agent import BaseAgent
+from src.agents.base_agent import BaseAgent, RULE_CONFIDENCE_THRESHOLD, compile_pattern, fold_for_keywords, keyword_date_patterns, may_match
 from src.models.data_models import ExtractedData, HospitalBillData
 
+# Precompiled extraction patterns, in priority order. Case-insensitive
+# patterns are paired with the keywords (lowercase) one of which any match
+# contains, so a pattern is only scanned when its keywords are in the text
+_HOSPITAL_PATTERNS = tuple((keywords, re.compile(p, re.IGNORECASE)) for keywords, p in [
+    (('hospital', 'medical', 'health', 'care', 'centre', 'center'),
+     r'([A-Z][a-z]+ (?:Hospital|Medical|Health|Care|Centre|Center))'),
+    (('hospital',), r'((?:Sir |Dr\. )?[A-Z][a-z]+ [A-Z][a-z]+ Hospital)'),
+    (('hospital',), r'([A-Z][A-Z\s]+HOSPITAL)'),
+    (('max healthcare', 'fortis', 'apollo', 'aiims', 'pgimer'), r'(Max Healthcare|Fortis|Apollo|AIIMS|PGIMER)')
+])
+
+_TOTAL_AMOUNT_PATTERNS = (
+    (('total', 'net amount', 'bill amount'),
+     compile_pattern(r'(?:Total|Grand Total|Net Amount|Bill Amount)[\s:]*(?:Rs\.?|INR|₹)?\s*([0-9,]+\.?[0-9]*)', re.IGNORECASE)),
+    (('₹', 'rs'), compile_pattern(r'(?:₹|Rs\.?)\s*([0-9,]+\.?[0-9]*)', re.IGNORECASE)),
+    # Without RE2, only try matches at the start of a digit run; a match
+    # starting inside a run implies one from its start, so findall is unchanged
+    (('/-', 'rs', 'inr'),
+     compile_pattern(r'([0-9,]+\.?[0-9]*)\s*(?:/-|Rs|INR)', re.IGNORECASE,
+                     fallback_pattern=r'(?=[0-9,])(?<![0-9,])([0-9,]+\.?[0-9]*)\s*(?:/-|Rs|INR)')),
+)
+
+_PATIENT_PATTERNS = tuple(re.compile(p) for p in [
+    r'(?:Patient|Name)[\s:]*([A-Z][a-z]+ [A-Z][a-z]+)',
+    r'(?:Mr\.?|Mrs\.?|Ms\.?)\s+([A-Z][a-z]+ [A-Z][a-z]+)',
+    r'Name[\s:]*([A-Z][A-Z\s]+)'
+])
+
+# Patterns without a literal prefix go through RE2, which rules them out in
+# one linear pass where re would retry at every position
+_INSURANCE_PATTERNS = (
+    (('acko general insurance',), re.compile(r'(ACKO General Insurance)', re.IGNORECASE)),
+    (('family health plan',), re.compile(r'(Family Health Plan)', re.IGNORECASE)),
+    (('sbi general insurance',), re.compile(r'(SBI General Insurance)', re.IGNORECASE)),
+    (('insurance',), compile_pattern(r'([A-Z][a-z]+ Insurance)', re.IGNORECASE)),
+    (('insurance company',), re.compile(r'Insurance Company[\s:]*([A-Z][a-z\s]+)', re.IGNORECASE)),
+)
+
+_POLICY_PATTERNS = (
+    re.compile(r'Policy[\s\w]*[:\s]*([A-Z0-9\-]+)'),
+    compile_pattern(r'([0-9]{10,})'),  # Long numeric sequences
+    re.compile(r'([A-Z]{2,}[0-9]{8,})'),  # Alphanumeric policy numbers
+)
+
+_SERVICE_DATE_PATTERNS = keyword_date_patterns(['service', 'treatment', 'visit'])
+_ADMISSION_DATE_PATTERNS = keyword_date_patterns(['admission', 'admit'])
+_DISCHARGE_DATE_PATTERNS = keyword_date_patterns(['discharge'])
+
+# What an amount match can reduce to without any digits once commas are removed
+_NO_NUMBER = frozenset(['', '.'])
+
+_AMOUNT_RE = re.compile(r'([0-9,]+\.?[0-9]*)')
+
+# Only the first line items are kept
+_MAX_LINE_ITEMS = 10
+
+# A whole line containing an amount, with its first amount as group 1
+_AMOUNT_LINE_RE = re.compile(r'^[^\n0-9,]*([0-9,]+\.?[0-9]*)[^\n]*', re.MULTILINE)
+
 class BillAgent(BaseAgent):
     """
     Agent specialized in extracting data from hospital bills.
@@ -12,33 +71,41 @@ class BillAgent(BaseAgent):
     def __init__(self):
         super().__init__("hospital_bill")
     
-    async def extract_data(self, text_content: str) -> ExtractedData:
+    async def extract_data(self, text_content: str, cleaned_text: Optional[str] = None) -> ExtractedData:
         """
         Extract structured data from hospital bill text.
         """
-        # Clean the text
-        cleaned_text = self._clean_text_for_processing(text_content)
-        
-        # Try LLM extraction first
-        llm_data = await self._llm_extract_bill_data(cleaned_text)
+        # Clean the text, unless the caller already did
+        if cleaned_text is None:
+            cleaned_text = self.clean_text(text_content)
         
-        # Fallback to rule-based extraction
-        rule_based_data = self._rule_based_extract(cleaned_text)
+        # Rule-based extraction first; the LLM is only needed when it falls short.
+        # The rules are CPU-bound, so they run in a worker thread off the event loop
+        loop = asyncio.get_running_loop()
+        rule_based_data = await loop.run_in_executor(None, self._rule_based_extract, cleaned_text)
+        confidence = self._calculate_confidence(rule_based_data, cleaned_text)
         
-        # Combine results, preferring LLM data when available
-        final_data = self._combine_extraction_results(llm_data, rule_based_data)
-        
-        # Calculate confidence score
-        confidence = self._calculate_confidence(final_data, cleaned_text)
+        if confidence >= RULE_CONFIDENCE_THRESHOLD:
+            final_data = rule_based_data
+        else:
+            llm_data = await self._llm_extract_bill_data(cleaned_text, rule_based_data)
+            
+            # Combine results, preferring LLM data when available
+            final_data = self._combine_extraction_results(llm_data, rule_based_data)
+            
+            # Calculate confidence score
+            confidence = self._calculate_confidence(final_data, cleaned_text)
         
-        return ExtractedData(
+        # Every field is built here, so skip Pydantic validation
+        return ExtractedData.model_construct(
             document_type="hospital_bill",
             data=final_data,
             extraction_confidence=confidence,
             raw_text=text_content
         )
     
-    async def _llm_extract_bill_data(self, text_content: str) -> Optional[Dict[str, Any]]:
+    async def _llm_extract_bill_data(self, text_content: str,
+                                     rule_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Use LLM to extract bill data.
         """
@@ -67,142 +134,83 @@ class BillAgent(BaseAgent):
         Return only the JSON object, no additional text.
         """
         
-        return await self._llm_extract(prompt, text_content)
+        return await self._routed_llm_extract(prompt, text_content, rule_data)
     
     def _rule_based_extract(self, text_content: str) -> Dict[str, Any]:
         """
         Rule-based extraction as fallback.
         """
+        # Fold the text once for every case-insensitive keyword check
+        folded_text = fold_for_keywords(text_content)
+        
         data = {
-            "hospital_name": self._extract_hospital_name(text_content),
-            "total_amount": self._extract_total_amount(text_content),
-            "date_of_service": self._extract_service_date(text_content),
+            "hospital_name": self._extract_hospital_name(text_content, folded_text),
+            "total_amount": self._extract_total_amount(text_content, folded_text),
+            "date_of_service": self._extract_service_date(text_content, folded_text),
             "patient_name": self._extract_patient_name(text_content),
-            "admission_date": self._extract_admission_date(text_content),
-            "discharge_date": self._extract_discharge_date(text_content),
-            "insurance_company": self._extract_insurance_company(text_content),
+            "admission_date": self._extract_admission_date(text_content, folded_text),
+            "discharge_date": self._extract_discharge_date(text_content, folded_text),
+            "insurance_company": self._extract_insurance_company(text_content, folded_text),
             "policy_number": self._extract_policy_number(text_content),
             "items": self._extract_line_items(text_content)
         }
         
         return data
     
-    def _extract_hospital_name(self, text: str) -> Optional[str]:
+    def _extract_hospital_name(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract hospital name from text."""
-        # Look for common hospital name patterns
-        patterns = [
-            r'([A-Z][a-z]+ (?:Hospital|Medical|Health|Care|Centre|Center))',
-            r'((?:Sir |Dr\. )?[A-Z][a-z]+ [A-Z][a-z]+ Hospital)',
-            r'([A-Z][A-Z\s]+HOSPITAL)',
-            r'(Max Healthcare|Fortis|Apollo|AIIMS|PGIMER)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for keywords, pattern in _HOSPITAL_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
         
         return None
     
-    def _extract_total_amount(self, text: str) -> Optional[float]:
+    def _extract_total_amount(self, text: str, folded_text: Optional[str] = None) -> Optional[float]:
         """Extract total amount from text."""
-        # Look for total amount patterns
-        patterns = [
-            r'(?:Total|Grand Total|Net Amount|Bill Amount)[\s:]*(?:Rs\.?|INR|₹)?\s*([0-9,]+\.?[0-9]*)',
-            r'(?:₹|Rs\.?)\s*([0-9,]+\.?[0-9]*)',
-            r'([0-9,]+\.?[0-9]*)\s*(?:/-|Rs|INR)'
-        ]
-        
         amounts = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                try:
-                    # Remove commas and convert to float
-                    amount = float(match.replace(',', ''))
-                    amounts.append(amount)
-                except ValueError:
-                    continue
+        for keywords, pattern in _TOTAL_AMOUNT_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            for match in pattern.findall(text):
+                # Remove commas and convert to float; a match of only commas
+                # and a dot holds no number
+                amount_str = match.replace(',', '')
+                if amount_str not in _NO_NUMBER:
+                    amounts.append(float(amount_str))
         
         # Return the largest amount found (likely to be the total)
         return max(amounts) if amounts else None
     
-    def _extract_service_date(self, text: str) -> Optional[str]:
+    def _extract_service_date(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract service date from text."""
-        return self._extract_date_pattern(text, ['service', 'treatment', 'visit'])
+        return self._extract_date_pattern(text, _SERVICE_DATE_PATTERNS, folded_text)
     
-    def _extract_admission_date(self, text: str) -> Optional[str]:
+    def _extract_admission_date(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract admission date from text."""
-        return self._extract_date_pattern(text, ['admission', 'admit'])
+        return self._extract_date_pattern(text, _ADMISSION_DATE_PATTERNS, folded_text)
     
-    def _extract_discharge_date(self, text: str) -> Optional[str]:
+    def _extract_discharge_date(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract discharge date from text."""
-        return self._extract_date_pattern(text, ['discharge'])
-    
-    def _extract_date_pattern(self, text: str, keywords: list) -> Optional[str]:
-        """Extract date based on keywords."""
-        # Date patterns
-        date_patterns = [
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
-            r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})',
-            r'(\d{1,2}\s+\w+\s+\d{4})'
-        ]
-        
-        for keyword in keywords:
-            # Look for keyword followed by date
-            for pattern in date_patterns:
-                regex = rf'{keyword}[:\s]*{pattern}'
-                match = re.search(regex, text, re.IGNORECASE)
-                if match:
-                    date_str = match.group(1)
-                    return self._normalize_date(date_str)
-        
-        return None
-    
-    def _normalize_date(self, date_str: str) -> Optional[str]:
-        """Normalize date to YYYY-MM-DD format."""
-        try:
-            # Try different date formats
-            formats = ['%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d', '%d-%m-%Y', '%Y/%m/%d']
-            
-            for fmt in formats:
-                try:
-                    date_obj = datetime.strptime(date_str, fmt)
-                    return date_obj.strftime('%Y-%m-%d')
-                except ValueError:
-                    continue
-            
-            return None
-        except:
-            return None
+        return self._extract_date_pattern(text, _DISCHARGE_DATE_PATTERNS, folded_text)
     
     def _extract_patient_name(self, text: str) -> Optional[str]:
         """Extract patient name from text."""
-        patterns = [
-            r'(?:Patient|Name)[\s:]*([A-Z][a-z]+ [A-Z][a-z]+)',
-            r'(?:Mr\.?|Mrs\.?|Ms\.?)\s+([A-Z][a-z]+ [A-Z][a-z]+)',
-            r'Name[\s:]*([A-Z][A-Z\s]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        for pattern in _PATIENT_PATTERNS:
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
         
         return None
     
-    def _extract_insurance_company(self, text: str) -> Optional[str]:
+    def _extract_insurance_company(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract insurance company name."""
-        patterns = [
-            r'(ACKO General Insurance)',
-            r'(Family Health Plan)',
-            r'(SBI General Insurance)',
-            r'([A-Z][a-z]+ Insurance)',
-            r'Insurance Company[\s:]*([A-Z][a-z\s]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for keywords, pattern in _INSURANCE_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
         
@@ -210,14 +218,8 @@ class BillAgent(BaseAgent):
     
     def _extract_policy_number(self, text: str) -> Optional[str]:
         """Extract policy number."""
-        patterns = [
-            r'Policy[\s\w]*[:\s]*([A-Z0-9\-]+)',
-            r'([0-9]{10,})',  # Long numeric sequences
-            r'([A-Z]{2,}[0-9]{8,})'  # Alphanumeric policy numbers
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        for pattern in _POLICY_PATTERNS:
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
         
@@ -227,25 +229,26 @@ class BillAgent(BaseAgent):
         """Extract line items from the bill."""
         items = []
         
-        # Look for itemized charges
-        lines = text.split('\n')
-        for line in lines:
+        # Look for itemized charges; lines without any amount are skipped by the scan
+        for line_match in _AMOUNT_LINE_RE.finditer(text):
             # Look for lines with description and amount
-            amount_match = re.search(r'([0-9,]+\.?[0-9]*)', line)
-            if amount_match and len(line.strip()) > 10:
+            line = line_match.group()
+            if len(line.strip()) > 10:
                 try:
-                    amount = float(amount_match.group(1).replace(',', ''))
-                    description = re.sub(r'[0-9,]+\.?[0-9]*', '', line).strip()
+                    amount = float(line_match.group(1).replace(',', ''))
+                    description = _AMOUNT_RE.sub('', line).strip()
                     if description and amount > 0:
                         items.append({
                             "description": description,
                             "amount": amount,
                             "quantity": 1
                         })
+                        if len(items) == _MAX_LINE_ITEMS:
+                            break  # No need to scan the rest of the bill
                 except ValueError:
                     continue
         
-        return items[:10]  # Limit to first 10 items
+        return items
     
     def _combine_extraction_results(self, llm_data: Optional[Dict[str, Any]], 
                                   rule_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -1,9 +1,50 @@
+import asyncio
 import re
-from datetime import datetime
 from typing import Dict, Any, Optional
-from src.agents.base_agent import BaseAgent
+from src.agents.base_agent import BaseAgent, RULE_CONFIDENCE_THRESHOLD, compile_pattern, fold_for_keywords, keyword_date_patterns, may_match
 from src.models.data_models import ExtractedData, DischargeSummaryData
 
+# Precompiled extraction patterns, in priority order. Case-insensitive
+# patterns are paired with the keywords (lowercase) one of which any match
+# contains, so a pattern is only scanned when its keywords are in the text
+_PATIENT_PATTERNS = tuple(re.compile(p) for p in [
+    r'(?:Patient|Name)[\s:]*([A-Z][a-z]+ [A-Z][a-z]+)',
+    r'(?:Mr\.?|Mrs\.?|Ms\.?)\s+([A-Z][a-z]+ [A-Z][a-z]+)',
+    r'Name[\s:]*([A-Z][A-Z\s]+)',
+    r'Patient Name[\s:]*([A-Za-z\s]+)'
+])
+
+_DIAGNOSIS_PATTERNS = tuple((keywords, re.compile(p, re.IGNORECASE)) for keywords, p in [
+    (('diagnosis',), r'(?:Diagnosis|Primary Diagnosis|Final Diagnosis)[\s:]*([A-Za-z\s,\-]+?)(?:\n|\.)'),
+    (('condition',), r'(?:Condition|Medical Condition)[\s:]*([A-Za-z\s,\-]+?)(?:\n|\.)'),
+    (('admitted for', 'treated for'), r'(?:Admitted for|Treated for)[\s:]*([A-Za-z\s,\-]+?)(?:\n|\.)')
+])
+
+_DOCTOR_PATTERNS = tuple((keywords, re.compile(p, re.IGNORECASE)) for keywords, p in [
+    (('dr', 'doctor'), r'(?:Dr\.?|Doctor)\s+([A-Z][a-z]+ [A-Z][a-z]+)'),
+    (('attending', 'consultant'), r'(?:Attending|Consultant)[\s\w]*[:\s]*(?:Dr\.?)\s*([A-Z][a-z]+ [A-Z][a-z]+)'),
+    (('physician', 'surgeon'), r'(?:Physician|Surgeon)[\s:]*(?:Dr\.?)\s*([A-Z][a-z]+ [A-Z][a-z]+)')
+])
+
+_HOSPITAL_PATTERNS = tuple((keywords, re.compile(p, re.IGNORECASE)) for keywords, p in [
+    (('hospital', 'medical', 'health', 'care', 'centre', 'center'),
+     r'([A-Z][a-z]+ (?:Hospital|Medical|Health|Care|Centre|Center))'),
+    (('hospital',), r'((?:Sir |Dr\. )?[A-Z][a-z]+ [A-Z][a-z]+ Hospital)'),
+    (('hospital',), r'([A-Z][A-Z\s]+HOSPITAL)'),
+    (('max healthcare', 'fortis', 'apollo', 'aiims', 'pgimer'), r'(Max Healthcare|Fortis|Apollo|AIIMS|PGIMER)')
+])
+
+_TREATMENT_PATTERNS = tuple((keywords, compile_pattern(p, re.IGNORECASE | re.DOTALL)) for keywords, p in [
+    (('treatment', 'procedure', 'management'),
+     r'(?:Treatment|Procedure|Management)[\s:]*([A-Za-z\s,\.\-]+?)(?:\n\n|\n[A-Z])'),
+    (('summary', 'course'), r'(?:Summary|Course)[\s:]*([A-Za-z\s,\.\-]+?)(?:\n\n|\n[A-Z])')
+])
+
+_ADMISSION_DATE_PATTERNS = keyword_date_patterns(['admission', 'admit', 'admitted'])
+_DISCHARGE_DATE_PATTERNS = keyword_date_patterns(['discharge', 'discharged'])
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
 class DischargeAgent(BaseAgent):
     """
     Agent specialized in extracting data from discharge summaries.
@@ -12,33 +53,41 @@ class DischargeAgent(BaseAgent):
     def __init__(self):
         super().__init__("discharge_summary")
     
-    async def extract_data(self, text_content: str) -> ExtractedData:
+    async def extract_data(self, text_content: str, cleaned_text: Optional[str] = None) -> ExtractedData:
         """
         Extract structured data from discharge summary text.
         """
-        # Clean the text
-        cleaned_text = self._clean_text_for_processing(text_content)
-        
-        # Try LLM extraction first
-        llm_data = await self._llm_extract_discharge_data(cleaned_text)
-        
-        # Fallback to rule-based extraction
-        rule_based_data = self._rule_based_extract(cleaned_text)
-        
-        # Combine results
-        final_data = self._combine_extraction_results(llm_data, rule_based_data)
-        
-        # Calculate confidence score
-        confidence = self._calculate_confidence(final_data, cleaned_text)
+        # Clean the text, unless the caller already did
+        if cleaned_text is None:
+            cleaned_text = self.clean_text(text_content)
+        
+        # Rule-based extraction first; the LLM is only needed when it falls short.
+        # The rules are CPU-bound, so they run in a worker thread off the event loop
+        loop = asyncio.get_running_loop()
+        rule_based_data = await loop.run_in_executor(None, self._rule_based_extract, cleaned_text)
+        confidence = self._calculate_confidence(rule_based_data, cleaned_text)
+        
+        if confidence >= RULE_CONFIDENCE_THRESHOLD:
+            final_data = rule_based_data
+        else:
+            llm_data = await self._llm_extract_discharge_data(cleaned_text, rule_based_data)
+            
+            # Combine results
+            final_data = self._combine_extraction_results(llm_data, rule_based_data)
+            
+            # Calculate confidence score
+            confidence = self._calculate_confidence(final_data, cleaned_text)
         
-        return ExtractedData(
+        # Every field is built here, so skip Pydantic validation
+        return ExtractedData.model_construct(
             document_type="discharge_summary",
             data=final_data,
             extraction_confidence=confidence,
             raw_text=text_content
         )
     
-    async def _llm_extract_discharge_data(self, text_content: str) -> Optional[Dict[str, Any]]:
+    async def _llm_extract_discharge_data(self, text_content: str,
+                                          rule_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Use LLM to extract discharge summary data.
         """
@@ -59,35 +108,31 @@ class DischargeAgent(BaseAgent):
         Return only the JSON object, no additional text.
         """
         
-        return await self._llm_extract(prompt, text_content)
+        return await self._routed_llm_extract(prompt, text_content, rule_data)
     
     def _rule_based_extract(self, text_content: str) -> Dict[str, Any]:
         """
         Rule-based extraction as fallback.
         """
+        # Fold the text once for every case-insensitive keyword check
+        folded_text = fold_for_keywords(text_content)
+        
         data = {
             "patient_name": self._extract_patient_name(text_content),
-            "diagnosis": self._extract_diagnosis(text_content),
-            "admission_date": self._extract_admission_date(text_content),
-            "discharge_date": self._extract_discharge_date(text_content),
-            "doctor_name": self._extract_doctor_name(text_content),
-            "hospital_name": self._extract_hospital_name(text_content),
-            "treatment_summary": self._extract_treatment_summary(text_content)
+            "diagnosis": self._extract_diagnosis(text_content, folded_text),
+            "admission_date": self._extract_admission_date(text_content, folded_text),
+            "discharge_date": self._extract_discharge_date(text_content, folded_text),
+            "doctor_name": self._extract_doctor_name(text_content, folded_text),
+            "hospital_name": self._extract_hospital_name(text_content, folded_text),
+            "treatment_summary": self._extract_treatment_summary(text_content, folded_text)
         }
         
         return data
     
     def _extract_patient_name(self, text: str) -> Optional[str]:
         """Extract patient name from text."""
-        patterns = [
-            r'(?:Patient|Name)[\s:]*([A-Z][a-z]+ [A-Z][a-z]+)',
-            r'(?:Mr\.?|Mrs\.?|Ms\.?)\s+([A-Z][a-z]+ [A-Z][a-z]+)',
-            r'Name[\s:]*([A-Z][A-Z\s]+)',
-            r'Patient Name[\s:]*([A-Za-z\s]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        for pattern in _PATIENT_PATTERNS:
+            match = pattern.search(text)
             if match:
                 name = match.group(1).strip()
                 # Validate name (should have at least 2 words)
@@ -96,115 +141,62 @@ class DischargeAgent(BaseAgent):
         
         return None
     
-    def _extract_diagnosis(self, text: str) -> Optional[str]:
+    def _extract_diagnosis(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract primary diagnosis from text."""
-        patterns = [
-            r'(?:Diagnosis|Primary Diagnosis|Final Diagnosis)[\s:]*([A-Za-z\s,\-]+?)(?:\n|\.)',
-            r'(?:Condition|Medical Condition)[\s:]*([A-Za-z\s,\-]+?)(?:\n|\.)',
-            r'(?:Admitted for|Treated for)[\s:]*([A-Za-z\s,\-]+?)(?:\n|\.)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for keywords, pattern in _DIAGNOSIS_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            match = pattern.search(text)
             if match:
                 diagnosis = match.group(1).strip()
                 # Clean up the diagnosis
-                diagnosis = re.sub(r'\s+', ' ', diagnosis)
+                diagnosis = _WHITESPACE_RE.sub(' ', diagnosis)
                 if len(diagnosis) > 5:  # Ensure it's not too short
                     return diagnosis
         
         return None
     
-    def _extract_admission_date(self, text: str) -> Optional[str]:
+    def _extract_admission_date(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract admission date from text."""
-        return self._extract_date_pattern(text, ['admission', 'admit', 'admitted'])
+        return self._extract_date_pattern(text, _ADMISSION_DATE_PATTERNS, folded_text)
     
-    def _extract_discharge_date(self, text: str) -> Optional[str]:
+    def _extract_discharge_date(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract discharge date from text."""
-        return self._extract_date_pattern(text, ['discharge', 'discharged'])
-    
-    def _extract_date_pattern(self, text: str, keywords: list) -> Optional[str]:
-        """Extract date based on keywords."""
-        # Date patterns
-        date_patterns = [
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
-            r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})',
-            r'(\d{1,2}\s+\w+\s+\d{4})'
-        ]
-        
-        for keyword in keywords:
-            # Look for keyword followed by date
-            for pattern in date_patterns:
-                regex = rf'{keyword}[:\s]*{pattern}'
-                match = re.search(regex, text, re.IGNORECASE)
-                if match:
-                    date_str = match.group(1)
-                    return self._normalize_date(date_str)
-        
-        return None
+        return self._extract_date_pattern(text, _DISCHARGE_DATE_PATTERNS, folded_text)
     
-    def _normalize_date(self, date_str: str) -> Optional[str]:
-        """Normalize date to YYYY-MM-DD format."""
-        try:
-            # Try different date formats
-            formats = ['%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d', '%d-%m-%Y', '%Y/%m/%d']
-            
-            for fmt in formats:
-                try:
-                    date_obj = datetime.strptime(date_str, fmt)
-                    return date_obj.strftime('%Y-%m-%d')
-                except ValueError:
-                    continue
-            
-            return None
-        except:
-            return None
-    
-    def _extract_doctor_name(self, text: str) -> Optional[str]:
+    def _extract_doctor_name(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract attending doctor name."""
-        patterns = [
-            r'(?:Dr\.?|Doctor)\s+([A-Z][a-z]+ [A-Z][a-z]+)',
-            r'(?:Attending|Consultant)[\s\w]*[:\s]*(?:Dr\.?)\s*([A-Z][a-z]+ [A-Z][a-z]+)',
-            r'(?:Physician|Surgeon)[\s:]*(?:Dr\.?)\s*([A-Z][a-z]+ [A-Z][a-z]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for keywords, pattern in _DOCTOR_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
         
         return None
     
-    def _extract_hospital_name(self, text: str) -> Optional[str]:
+    def _extract_hospital_name(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract hospital name from text."""
-        patterns = [
-            r'([A-Z][a-z]+ (?:Hospital|Medical|Health|Care|Centre|Center))',
-            r'((?:Sir |Dr\. )?[A-Z][a-z]+ [A-Z][a-z]+ Hospital)',
-            r'([A-Z][A-Z\s]+HOSPITAL)',
-            r'(Max Healthcare|Fortis|Apollo|AIIMS|PGIMER)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for keywords, pattern in _HOSPITAL_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
         
         return None
     
-    def _extract_treatment_summary(self, text: str) -> Optional[str]:
+    def _extract_treatment_summary(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract treatment summary from text."""
         # Look for treatment or procedure sections
-        patterns = [
-            r'(?:Treatment|Procedure|Management)[\s:]*([A-Za-z\s,\.\-]+?)(?:\n\n|\n[A-Z])',
-            r'(?:Summary|Course)[\s:]*([A-Za-z\s,\.\-]+?)(?:\n\n|\n[A-Z])'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        for keywords, pattern in _TREATMENT_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            match = pattern.search(text)
             if match:
                 summary = match.group(1).strip()
                 # Clean up the summary
-                summary = re.sub(r'\s+', ' ', summary)
+                summary = _WHITESPACE_RE.sub(' ', summary)
                 if len(summary) > 20:  # Ensure it's substantial
                     return summary[:500]  # Limit length
         
@@ -1,9 +1,72 @@
+import asyncio
 import re
-from datetime import datetime
 from typing import Dict, Any, Optional
-from src.agents.base_agent import BaseAgent
+from src.agents.base_agent import BaseAgent, compile_pattern, fold_for_keywords, keyword_date_patterns, may_match
 from src.models.data_models import ExtractedData, InsuranceCardData
 
+# Precompiled extraction patterns, in priority order, each paired with the
+# keywords (lowercase) one of which any match contains, so a pattern is only
+# scanned when its keywords are in the text; () means always scan
+# Patterns without a literal prefix go through RE2, which rules them out in
+# one linear pass where re would retry (and backtrack) at every position
+_POLICY_PATTERNS = (
+    (('policy', 'card', 'member'),
+     compile_pattern(r'(?:Policy|Card|Member)[\s\w]*[:\s]*([A-Z0-9\-]{8,})', re.IGNORECASE)),
+    ((), compile_pattern(r'([0-9]{10,})', re.IGNORECASE)),  # Long numeric sequences
+    ((), compile_pattern(r'([A-Z]{2,}[0-9]{8,})', re.IGNORECASE)),  # Alphanumeric policy numbers
+    (('policy no',), re.compile(r'Policy No[\s.:]*([A-Z0-9\-]+)', re.IGNORECASE)),
+    (('card no',), re.compile(r'Card No[\s.:]*([A-Z0-9\-]+)', re.IGNORECASE)),
+)
+
+_CARD_HOLDER_PATTERNS = tuple((keywords, re.compile(p, re.IGNORECASE)) for keywords, p in [
+    (('name', 'card holder', 'member'), r'(?:Name|Card Holder|Member)[\s:]*([A-Z][a-z]+ [A-Z][a-z]+)'),
+    (('mr', 'ms'), r'(?:Mr\.?|Mrs\.?|Ms\.?)\s+([A-Z][a-z]+ [A-Z][a-z]+)'),
+    (('member name',), r'Member Name[\s:]*([A-Za-z\s]+)'),
+    (('insured',), r'Insured[\s:]*([A-Z][a-z]+ [A-Z][a-z]+)')
+])
+
+_INSURER_NAMES = [
+    'ACKO General Insurance',
+    'SBI General Insurance',
+    'Family Health Plan',
+    'HDFC ERGO',
+    'ICICI Lombard',
+    'Bajaj Allianz',
+    'Star Health',
+    'Max Bupa'
+]
+
+_INSURER_NAME_PATTERNS = tuple(
+    ((name.casefold(),), re.compile(f'({name})', re.IGNORECASE)) for name in _INSURER_NAMES
+)
+
+# All known insurers in one alternation; group i+1 is _INSURER_NAMES[i]
+_INSURER_NAME_RE = compile_pattern('|'.join(f'({name})' for name in _INSURER_NAMES), re.IGNORECASE)
+
+_INSURANCE_COMPANY_PATTERNS = (
+    (('insurance',), compile_pattern(r'([A-Z][a-z]+ Insurance)', re.IGNORECASE)),
+    (('insurance company',), re.compile(r'Insurance Company[\s:]*([A-Z][a-z\s]+)', re.IGNORECASE)),
+    (('insurer',), re.compile(r'Insurer[\s:]*([A-Z][a-z\s]+)', re.IGNORECASE)),
+)
+
+_SUM_INSURED_PATTERNS = (
+    (('sum insured', 'coverage', 'limit'),
+     re.compile(r'(?:Sum Insured|Coverage|Limit)[\s:]*(?:Rs\.?|INR|₹)?\s*([0-9,]+\.?[0-9]*)', re.IGNORECASE)),
+    (('₹', 'rs'), re.compile(r'(?:₹|Rs\.?)\s*([0-9,]+\.?[0-9]*)', re.IGNORECASE)),
+    # Without RE2, only try matches at the start of a digit run; a match
+    # starting inside a run implies one from its start, so findall is unchanged
+    (('/-', 'rs', 'inr'),
+     compile_pattern(r'([0-9,]+\.?[0-9]*)\s*(?:/-|Rs|INR)', re.IGNORECASE,
+                     fallback_pattern=r'(?=[0-9,])(?<![0-9,])([0-9,]+\.?[0-9]*)\s*(?:/-|Rs|INR)')),
+    (('coverage',), re.compile(r'Coverage[\s:]*([0-9,]+)', re.IGNORECASE)),
+    (('limit',), re.compile(r'Limit[\s:]*([0-9,]+)', re.IGNORECASE)),
+)
+
+# What an amount match can reduce to without any digits once commas are removed
+_NO_NUMBER = frozenset(['', '.'])
+
+_VALIDITY_DATE_PATTERNS = keyword_date_patterns(['validity', 'valid', 'expiry', 'expires', 'until'])
+
 class InsuranceAgent(BaseAgent):
     """
     Agent specialized in extracting data from insurance cards and policy documents.
@@ -12,18 +75,21 @@ class InsuranceAgent(BaseAgent):
     def __init__(self):
         super().__init__("insurance_card")
     
-    async def extract_data(self, text_content: str) -> ExtractedData:
+    async def extract_data(self, text_content: str, cleaned_text: Optional[str] = None) -> ExtractedData:
         """
         Extract structured data from insurance card text.
         """
-        # Clean the text
-        cleaned_text = self._clean_text_for_processing(text_content)
-        
-        # Try LLM extraction first
-        llm_data = await self._llm_extract_insurance_data(cleaned_text)
-        
-        # Fallback to rule-based extraction
-        rule_based_data = self._rule_based_extract(cleaned_text)
+        # Clean the text, unless the caller already did
+        if cleaned_text is None:
+            cleaned_text = self.clean_text(text_content)
+        
+        # Run LLM extraction and the rule-based fallback concurrently; the rules
+        # are CPU-bound, so they run in a worker thread off the event loop
+        loop = asyncio.get_running_loop()
+        llm_data, rule_based_data = await asyncio.gather(
+            self._llm_extract_insurance_data(cleaned_text),
+            loop.run_in_executor(None, self._rule_based_extract, cleaned_text)
+        )
         
         # Combine results
         final_data = self._combine_extraction_results(llm_data, rule_based_data)
@@ -31,7 +97,8 @@ class InsuranceAgent(BaseAgent):
         # Calculate confidence score
         confidence = self._calculate_confidence(final_data, cleaned_text)
         
-        return ExtractedData(
+        # Every field is built here, so skip Pydantic validation
+        return ExtractedData.model_construct(
             document_type="insurance_card",
             data=final_data,
             extraction_confidence=confidence,
@@ -64,28 +131,25 @@ class InsuranceAgent(BaseAgent):
         """
         Rule-based extraction as fallback.
         """
+        # Fold the text once for every case-insensitive keyword check
+        folded_text = fold_for_keywords(text_content)
+        
         data = {
-            "policy_number": self._extract_policy_number(text_content),
-            "card_holder_name": self._extract_card_holder_name(text_content),
-            "insurance_company": self._extract_insurance_company(text_content),
-            "sum_insured": self._extract_sum_insured(text_content),
-            "validity_date": self._extract_validity_date(text_content)
+            "policy_number": self._extract_policy_number(text_content, folded_text),
+            "card_holder_name": self._extract_card_holder_name(text_content, folded_text),
+            "insurance_company": self._extract_insurance_company(text_content, folded_text),
+            "sum_insured": self._extract_sum_insured(text_content, folded_text),
+            "validity_date": self._extract_validity_date(text_content, folded_text)
         }
         
         return data
     
-    def _extract_policy_number(self, text: str) -> Optional[str]:
+    def _extract_policy_number(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract policy number from text."""
-        patterns = [
-            r'(?:Policy|Card|Member)[\s\w]*[:\s]*([A-Z0-9\-]{8,})',
-            r'([0-9]{10,})',  # Long numeric sequences
-            r'([A-Z]{2,}[0-9]{8,})',  # Alphanumeric policy numbers
-            r'Policy No[\s.:]*([A-Z0-9\-]+)',
-            r'Card No[\s.:]*([A-Z0-9\-]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for keywords, pattern in _POLICY_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            match = pattern.search(text)
             if match:
                 policy_num = match.group(1).strip()
                 # Validate policy number (should be at least 8 characters)
@@ -94,17 +158,12 @@ class InsuranceAgent(BaseAgent):
         
         return None
     
-    def _extract_card_holder_name(self, text: str) -> Optional[str]:
+    def _extract_card_holder_name(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract card holder name from text."""
-        patterns = [
-            r'(?:Name|Card Holder|Member)[\s:]*([A-Z][a-z]+ [A-Z][a-z]+)',
-            r'(?:Mr\.?|Mrs\.?|Ms\.?)\s+([A-Z][a-z]+ [A-Z][a-z]+)',
-            r'Member Name[\s:]*([A-Za-z\s]+)',
-            r'Insured[\s:]*([A-Z][a-z]+ [A-Z][a-z]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for keywords, pattern in _CARD_HOLDER_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            match = pattern.search(text)
             if match:
                 name = match.group(1).strip()
                 # Validate name (should have at least 2 words)
@@ -113,24 +172,24 @@ class InsuranceAgent(BaseAgent):
         
         return None
     
-    def _extract_insurance_company(self, text: str) -> Optional[str]:
+    def _extract_insurance_company(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract insurance company name."""
-        patterns = [
-            r'(ACKO General Insurance)',
-            r'(SBI General Insurance)',
-            r'(Family Health Plan)',
-            r'(HDFC ERGO)',
-            r'(ICICI Lombard)',
-            r'(Bajaj Allianz)',
-            r'(Star Health)',
-            r'(Max Bupa)',
-            r'([A-Z][a-z]+ Insurance)',
-            r'Insurance Company[\s:]*([A-Z][a-z\s]+)',
-            r'Insurer[\s:]*([A-Z][a-z\s]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        # One scan finds the leftmost known insurer, or rules them all out
+        match = _INSURER_NAME_RE.search(text)
+        if match:
+            # Insurers listed before it take priority even if they appear later
+            for keywords, pattern in _INSURER_NAME_PATTERNS[:match.lastindex - 1]:
+                if not may_match(folded_text, keywords):
+                    continue
+                earlier_match = pattern.search(text)
+                if earlier_match:
+                    return earlier_match.group(1).strip()
+            return match.group(match.lastindex).strip()
+        
+        for keywords, pattern in _INSURANCE_COMPANY_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            match = pattern.search(text)
             if match:
                 company = match.group(1).strip()
                 if len(company) > 3:  # Ensure it's not too short
@@ -138,72 +197,29 @@ class InsuranceAgent(BaseAgent):
         
         return None
     
-    def _extract_sum_insured(self, text: str) -> Optional[float]:
+    def _extract_sum_insured(self, text: str, folded_text: Optional[str] = None) -> Optional[float]:
         """Extract sum insured amount."""
-        patterns = [
-            r'(?:Sum Insured|Coverage|Limit)[\s:]*(?:Rs\.?|INR|₹)?\s*([0-9,]+\.?[0-9]*)',
-            r'(?:₹|Rs\.?)\s*([0-9,]+\.?[0-9]*)',
-            r'([0-9,]+\.?[0-9]*)\s*(?:/-|Rs|INR)',
-            r'Coverage[\s:]*([0-9,]+)',
-            r'Limit[\s:]*([0-9,]+)'
-        ]
-        
         amounts = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                try:
-                    # Remove commas and convert to float
-                    amount = float(match.replace(',', ''))
-                    # Filter out unreasonably small amounts (likely not sum insured)
-                    if amount >= 10000:
-                        amounts.append(amount)
-                except ValueError:
+        for keywords, pattern in _SUM_INSURED_PATTERNS:
+            if not may_match(folded_text, keywords):
+                continue
+            for match in pattern.findall(text):
+                # Remove commas and convert to float; a match of only commas
+                # and a dot holds no number
+                amount_str = match.replace(',', '')
+                if amount_str in _NO_NUMBER:
                     continue
+                amount = float(amount_str)
+                # Filter out unreasonably small amounts (likely not sum insured)
+                if amount >= 10000:
+                    amounts.append(amount)
         
         # Return the largest amount found (likely to be the sum insured)
         return max(amounts) if amounts else None
     
-    def _extract_validity_date(self, text: str) -> Optional[str]:
+    def _extract_validity_date(self, text: str, folded_text: Optional[str] = None) -> Optional[str]:
         """Extract validity or expiry date."""
-        return self._extract_date_pattern(text, ['validity', 'valid', 'expiry', 'expires', 'until'])
-    
-    def _extract_date_pattern(self, text: str, keywords: list) -> Optional[str]:
-        """Extract date based on keywords."""
-        # Date patterns
-        date_patterns = [
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
-            r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})',
-            r'(\d{1,2}\s+\w+\s+\d{4})'
-        ]
-        
-        for keyword in keywords:
-            # Look for keyword followed by date
-            for pattern in date_patterns:
-                regex = rf'{keyword}[:\s]*{pattern}'
-                match = re.search(regex, text, re.IGNORECASE)
-                if match:
-                    date_str = match.group(1)
-                    return self._normalize_date(date_str)
-        
-        return None
-    
-    def _normalize_date(self, date_str: str) -> Optional[str]:
-        """Normalize date to YYYY-MM-DD format."""
-        try:
-            # Try different date formats
-            formats = ['%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d', '%d-%m-%Y', '%Y/%m/%d']
-            
-            for fmt in formats:
-                try:
-                    date_obj = datetime.strptime(date_str, fmt)
-                    return date_obj.strftime('%Y-%m-%d')
-                except ValueError:
-                    continue
-            
-            return None
-        except:
-            return None
+        return self._extract_date_pattern(text, _VALIDITY_DATE_PATTERNS, folded_text)
     
     def _combine_extraction_results(self, llm_data: Optional[Dict[str, Any]], 
                                   rule_data: Dict[str, Any]) -> Dict[str, Any]:
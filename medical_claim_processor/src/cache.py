@@ -0,0 +1,164 @@
+import asyncio
+import copy
+import hashlib
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+# Cached results expire after a week unless configured otherwise
+DEFAULT_TTL = int(os.getenv('RESULT_CACHE_TTL', str(7 * 24 * 3600)))
+
+class SQLiteCache:
+    """
+    Persistent result cache in a local SQLite file.
+    
+    sqlite3 calls block, so they run in the default thread pool.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._table_ready = False
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._get, key)
+    
+    async def set(self, key: str, value: bytes, ttl: int):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._set, key, value, ttl)
+    
+    def _connect(self) -> sqlite3.Connection:
+        if not self._table_ready:
+            # The file holds patient data, so only the owner may open it
+            os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+            os.chmod(self.path, 0o600)
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._table_ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value BLOB, expires_at INTEGER)"
+            )
+            conn.commit()
+            self._table_ready = True
+        return conn
+    
+    def _get(self, key: str) -> Optional[bytes]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value FROM results WHERE key = ? AND expires_at > ?",
+                (key, int(time.time()))
+            ).fetchone()
+        return row[0] if row else None
+    
+    def _set(self, key: str, value: bytes, ttl: int):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, int(time.time()) + ttl)
+            )
+            conn.commit()
+
+class RedisCache:
+    """
+    Result cache shared by all workers through Redis.
+    """
+    
+    def __init__(self, url: str):
+        import redis.asyncio as redis  # Imported only when REDIS_URL is set
+        self._client = redis.from_url(url)
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+    
+    async def set(self, key: str, value: bytes, ttl: int):
+        await self._client.set(key, value, ex=ttl)
+
+class MemoryCache:
+    """
+    In-process LRU cache to check before the persistent one.
+    
+    Entries expire after DEFAULT_TTL, like persisted ones.
+    """
+    
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the value for key, if present and not expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+    
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store value under key, evicting the least recently used entry."""
+        self._entries[key] = (time.monotonic() + DEFAULT_TTL, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+_backend = None
+
+def _default_cache_path() -> str:
+    """
+    Return the cache file in a directory private to the current user, under
+    $XDG_CACHE_HOME (~/.cache by default).
+    """
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    directory = os.path.join(base, 'medical_claim_processor')
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    os.chmod(directory, 0o700)
+    return os.path.join(directory, 'result_cache.sqlite3')
+
+def _get_backend():
+    """Create the cache backend on first use: Redis if REDIS_URL is set, else SQLite."""
+    global _backend
+    if _backend is None:
+        redis_url = os.getenv('REDIS_URL')
+        if redis_url:
+            try:
+                _backend = RedisCache(redis_url)
+            except ImportError:
+                print("REDIS_URL is set but redis is not installed; using SQLite cache")
+        if _backend is None:
+            _backend = SQLiteCache(os.getenv('RESULT_CACHE_PATH') or _default_cache_path())
+    return _backend
+
+def make_key(*parts: str) -> str:
+    """Build a cache key from its parts, e.g. agent type, prompt version and document text."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b'\x00')
+    return f"result:{digest.hexdigest()}"
+
+async def get(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the cached value for key, or None on a miss or cache error.
+    """
+    try:
+        value = await _get_backend().get(key)
+        return orjson.loads(value) if value is not None else None
+    except Exception as e:
+        print(f"Result cache read failed: {e}")
+        return None
+
+async def set(key: str, value: Dict[str, Any], ttl: int = DEFAULT_TTL):
+    """
+    Store value under key; cache errors are logged and otherwise ignored.
+    """
+    try:
+        await _get_backend().set(key, orjson.dumps(value), ttl)
+    except Exception as e:
+        print(f"Result cache write failed: {e}")
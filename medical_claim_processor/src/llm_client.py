@@ -0,0 +1,27 @@
+import google.generativeai as genai
+import os
+from functools import lru_cache
+from typing import Optional
+
+# Read once at import; every agent and service shares one configured client
+_GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', 'your-api-key-here')
+if _GEMINI_API_KEY != 'your-api-key-here':
+    genai.configure(api_key=_GEMINI_API_KEY)
+
+@lru_cache(maxsize=None)
+def get_gemini(model_name: str = 'gemini-1.5-flash', system_instruction: Optional[str] = None,
+               response_mime_type: Optional[str] = None):
+    """
+    Return the shared Gemini model for these settings, or None if no API key is configured.
+
+    Models are created on first use and then reused by every caller, so
+    they all go through the SDK's one client and its open connection.
+    """
+    if _GEMINI_API_KEY == 'your-api-key-here':
+        return None
+    generation_config = {'response_mime_type': response_mime_type} if response_mime_type else None
+    return genai.GenerativeModel(
+        model_name,
+        system_instruction=system_instruction,
+        generation_config=generation_config
+    )
@@ -3,19 +3,32 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from typing import List
 import uvicorn
 
+from src.agents.base_agent import BaseAgent
 from src.models.data_models import ProcessClaimResponse
-from src.services.claim_processor import ClaimProcessor
+from src.services.claim_processor import ClaimProcessor, prewarm_pdf_pool, web_concurrency
 from src.services.pdf_generator import PDFGenerator
-import io
 
-app = FastAPI(title="Medical Claim Processor", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Optionally open the Gemini connection (and load the prompt tokenizer) and start the PDF workers before the first request."""
+    if os.getenv('GEMINI_PREWARM', '').lower() in ('1', 'true', 'yes'):
+        await BaseAgent.prewarm()
+    if os.getenv('PDF_PREWARM', '').lower() in ('1', 'true', 'yes'):
+        await run_in_threadpool(prewarm_pdf_pool)
+    yield
+
+# JSON responses are serialized with orjson rather than the stdlib json module
+app = FastAPI(title="Medical Claim Processor", version="1.0.0", lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 
 # Enable CORS for all origins
 app.add_middleware(
@@ -62,10 +75,11 @@ async def generate_pdf(results: dict):
     Generate a professional PDF report from claim processing results.
     """
     try:
-        pdf_bytes = pdf_generator.generate_claim_report(results)
+        # Build the report in a worker thread; the event loop keeps serving meanwhile
+        pdf_chunks = await run_in_threadpool(pdf_generator.stream_claim_report, results)
         
         return StreamingResponse(
-            io.BytesIO(pdf_bytes),
+            pdf_chunks,
             media_type="application/pdf",
             headers={
                 "Content-Disposition": f"attachment; filename=claim-processing-result.pdf"
@@ -90,5 +104,9 @@ async def health_check():
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    uvicorn.run("src.main:app", host='0.0.0.0', port=port, reload=False)
+    # One worker process unless WEB_CONCURRENCY says otherwise ("auto" for one
+    # per CPU); each runs on uvloop with the httptools parser when installed
+    workers = web_concurrency()
+    uvicorn.run("src.main:app", host='0.0.0.0', port=port, reload=False,
+                workers=workers, loop='auto', http='auto')
 
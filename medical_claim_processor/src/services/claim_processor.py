@@ -1,23 +1,75 @@
 import asyncio
+import multiprocessing
 import os
-import tempfile
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Dict, Any
 from fastapi import UploadFile
-import subprocess
+import pypdfium2 as pdfium
 
 from src.models.data_models import (
     ProcessClaimResponse, ValidationResult, ClaimDecision,
     ClassifiedDocument, ExtractedData
 )
 from src.services.document_classifier import DocumentClassifier
-from src.services.text_extractor import TextExtractor
+from src.services.text_extractor import TextExtractor, read_pdf_text
+from src.agents.base_agent import BaseAgent, current_claim_id
 from src.agents.bill_agent import BillAgent
 from src.agents.discharge_agent import DischargeAgent
 from src.agents.insurance_agent import InsuranceAgent
 from src.services.validator import ClaimValidator
 from src.services.decision_engine import DecisionEngine
 
+def web_concurrency() -> int:
+    """
+    Number of server worker processes: WEB_CONCURRENCY if set ("auto" for one
+    per CPU), otherwise 1.
+    """
+    value = os.getenv('WEB_CONCURRENCY') or '1'
+    if value.strip().lower() == 'auto':
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+# Each server worker runs its own PDF pool, so the CPUs are shared between them
+_PDF_WORKERS = int(os.getenv('PDF_WORKERS', str(max(1, min(4, (os.cpu_count() or 1) // web_concurrency())))))
+_pdf_pool = None
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Create the PDF parsing process pool on first use.
+    
+    Each process has its own PDFium, so documents parse in parallel. Workers
+    are spawned rather than forked, as the server process runs threads.
+    """
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=_PDF_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _pdf_pool
+
+def _reset_pdf_pool(broken_pool: ProcessPoolExecutor) -> None:
+    """
+    Discard a pool broken by a dead worker, so the next call starts a new one.
+    
+    Concurrent callers may all see the same broken pool; only the first one
+    replaces it.
+    """
+    global _pdf_pool
+    if _pdf_pool is broken_pool:
+        _pdf_pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+
+def prewarm_pdf_pool() -> None:
+    """
+    Start every PDF worker process now rather than on the first upload.
+    """
+    pool = _get_pdf_pool()
+    for future in [pool.submit(os.getpid) for _ in range(_PDF_WORKERS)]:
+        future.result()
+
 class ClaimProcessor:
     def __init__(self):
         self.document_classifier = DocumentClassifier()
@@ -33,7 +85,7 @@ class ClaimProcessor:
         Main orchestration method for processing medical claim documents.
         """
         try:
-            # Step 1: Save uploaded files temporarily and extract text
+            # Step 1: Read uploaded files and extract text
             documents_data = await self._prepare_documents(files)
             
             # Step 2: Classify each document
@@ -63,120 +115,133 @@ class ClaimProcessor:
             return response
             
         except Exception as e:
-            # Return error response
-            return ProcessClaimResponse(
+            # Return error response; its fields are fixed apart from the message,
+            # so skip validation (FastAPI validates the response on the way out)
+            error = str(e)
+            return ProcessClaimResponse.model_construct(
                 documents={},
-                validation=ValidationResult(
-                    discrepancies=[f"Processing error: {str(e)}"]
+                validation=ValidationResult.model_construct(
+                    discrepancies=[f"Processing error: {error}"]
                 ),
-                claim_decision=ClaimDecision(
+                claim_decision=ClaimDecision.model_construct(
                     status="rejected",
-                    reason=f"Unable to process claim due to error: {str(e)}"
+                    reason=f"Unable to process claim due to error: {error}"
                 )
             )
     
     async def _prepare_documents(self, files: List[UploadFile]) -> List[Dict[str, Any]]:
         """
-        Save uploaded files and extract text content.
+        Read uploaded files and extract text content.
         """
-        documents_data = []
+        # Prepare all files concurrently, keeping upload order
+        documents_data = await asyncio.gather(*(
+            self._prepare_document(file) for file in files
+        ))
         
-        for file in files:
-            # Generate unique file ID
-            file_id = str(uuid.uuid4())
-            
-            # Save file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                content = await file.read()
-                temp_file.write(content)
-                temp_file_path = temp_file.name
-            
-            # Extract text from PDF
-            text_content = self._extract_text_from_pdf(temp_file_path)
-            
-            documents_data.append({
-                'file_id': file_id,
-                'filename': file.filename,
-                'content_type': file.content_type,
-                'temp_path': temp_file_path,
-                'text_content': text_content
-            })
-            
-        return documents_data
+        return list(documents_data)
     
-    async def _extract_text_from_pdf(self, pdf_path: str) -> str:
+    async def _prepare_document(self, file: UploadFile) -> Dict[str, Any]:
         """
-        Extract text from PDF using pdftotext asynchronously.
+        Read one uploaded file and extract its text content.
         """
-        loop = asyncio.get_event_loop()
-        try:
-            result = await loop.run_in_executor(
-                None,  # Use the default ThreadPoolExecutor
-                lambda: subprocess.run(
-                    ['pdftotext', pdf_path, '-'],
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-            )
-            return result.stdout
-        except subprocess.CalledProcessError:
-            return ""
-        finally:
-            # Clean up the temporary PDF file immediately after text extraction
-            if os.path.exists(pdf_path):
-                os.remove(pdf_path)
+        # Generate unique file ID
+        file_id = str(uuid.uuid4())
+        
+        # Extract text straight from the uploaded bytes
+        content = await file.read()
+        text_content = await self._extract_text_from_pdf(content)
+        
+        return {
+            'file_id': file_id,
+            'filename': file.filename,
+            'content_type': file.content_type,
+            'text_content': text_content,
+            # Cleaned once here rather than by each agent that reads it
+            'cleaned_text': BaseAgent.clean_text(text_content)
+        }
+    
+    async def _extract_text_from_pdf(self, pdf_bytes: bytes) -> str:
+        """
+        Extract text from PDF bytes with PDFium in a worker process.
+        """
+        loop = asyncio.get_running_loop()
+        for _ in range(2):
+            pool = _get_pdf_pool()
+            try:
+                return await loop.run_in_executor(pool, read_pdf_text, pdf_bytes)
+            except pdfium.PdfiumError:
+                return ""
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory) and broke the pool; retry
+                # once on a new pool, as this document need not be the cause
+                _reset_pdf_pool(pool)
+                error = e
+        
+        print(f"PDF text extraction failed, worker process died: {error!r}")
+        return ""
     
     async def _classify_documents(self, documents_data: List[Dict[str, Any]]) -> List[ClassifiedDocument]:
         """
         Classify each document using the document classifier.
         """
-        classified_docs = []
-        
-        for doc_data in documents_data:
-            classification = await self.document_classifier.classify(
+        # Classify all documents concurrently, keeping document order
+        return await self.document_classifier.classify_batch([
+            (
                 doc_data['file_id'],  # Pass file_id instead of filename
                 doc_data['filename'],
                 doc_data['text_content']
             )
-            classified_docs.append(classification)
-            
-        return classified_docs
+            for doc_data in documents_data
+        ])
     
     async def _extract_data(self, classified_docs: List[ClassifiedDocument], 
                           documents_data: List[Dict[str, Any]]) -> List[ExtractedData]:
         """
         Extract structured data using appropriate agents based on document type.
         """
-        extracted_data = []
-        
         # Create a mapping of file_id to document data
         doc_data_map = {doc['file_id']: doc for doc in documents_data}
         
-        for classified_doc in classified_docs:
-            doc_data = doc_data_map[classified_doc.file_id]
-            text_content = doc_data['text_content']
-            
-            # Route to appropriate agent based on document type
-            if classified_doc.document_type == "hospital_bill":
-                extracted = await self.bill_agent.extract_data(text_content)
-            elif classified_doc.document_type == "discharge_summary":
-                extracted = await self.discharge_agent.extract_data(text_content)
-            elif classified_doc.document_type == "insurance_card":
-                extracted = await self.insurance_agent.extract_data(text_content)
-            else:
-                # Handle unknown document types
-                extracted = ExtractedData(
-                    document_type="other",
-                    data={},
-                    extraction_confidence=0.0,
-                    raw_text=text_content
-                )
-            
-            extracted.raw_text = text_content
-            extracted_data.append(extracted)
-            
-        return extracted_data
+        # Scope the agents' LLM prompts to this claim, so the batcher only
+        # combines them with prompts for the claim's other documents
+        claim_token = current_claim_id.set(str(uuid.uuid4()))
+        try:
+            # Run the agents for all documents concurrently, keeping document order
+            extracted_data = await asyncio.gather(*(
+                self._extract_document_data(classified_doc, doc_data_map[classified_doc.file_id])
+                for classified_doc in classified_docs
+            ))
+        finally:
+            current_claim_id.reset(claim_token)
+        
+        return list(extracted_data)
+    
+    async def _extract_document_data(self, classified_doc: ClassifiedDocument, 
+                                     doc_data: Dict[str, Any]) -> ExtractedData:
+        """
+        Extract structured data from one document with the agent for its type.
+        """
+        text_content = doc_data['text_content']
+        cleaned_text = doc_data['cleaned_text']
+        
+        # Route to appropriate agent based on document type
+        if classified_doc.document_type == "hospital_bill":
+            extracted = await self.bill_agent.extract_data_cached(text_content, cleaned_text)
+        elif classified_doc.document_type == "discharge_summary":
+            extracted = await self.discharge_agent.extract_data_cached(text_content, cleaned_text)
+        elif classified_doc.document_type == "insurance_card":
+            extracted = await self.insurance_agent.extract_data_cached(text_content, cleaned_text)
+        else:
+            # Handle unknown document types; the fields are fixed, so skip validation
+            extracted = ExtractedData.model_construct(
+                document_type="other",
+                data={},
+                extraction_confidence=0.0,
+                raw_text=text_content
+            )
+        
+        extracted.raw_text = text_content
+        return extracted
     
     async def _validate_data(self, extracted_data: List[ExtractedData]) -> ValidationResult:
         """
@@ -205,11 +270,3 @@ class ClaimProcessor:
             }
             
         return documents
-    
-    def __del__(self):
-        """
-        Cleanup temporary files when the processor is destroyed.
-        """
-        # Note: In a production system, you'd want a more robust cleanup mechanism
-        pass
-
@@ -1,21 +1,83 @@
-import google.generativeai as genai
+import asyncio
+import json
+import orjson
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from src import cache as result_cache
+from src.llm_client import get_gemini
 from src.models.data_models import ExtractedData, ValidationResult, ClaimDecision
 
+# Static part of the decision prompt, sent once as the model's system
+# instruction so each request carries only the claim itself
+_DECISION_INSTRUCTION = """
+You are a medical insurance claim processor. Based on the information given,
+make a decision on whether to approve or reject the claim.
+
+Consider the following factors:
+1. Document completeness and authenticity
+2. Data consistency across documents
+3. Medical necessity and reasonableness of charges
+4. Policy coverage and limits
+
+Respond with a JSON object in this format:
+{
+    "status": "approved" or "rejected" or "pending",
+    "reason": "Detailed explanation for the decision",
+    "confidence": 0.85,
+    "recommended_amount": 12345.67
+}
+
+Return only the JSON object, no additional text.
+"""
+
+# Bump when the decision prompt changes, to invalidate cached decisions
+_PROMPT_VERSION = "1"
+
+_MODEL_NAME = 'gemini-1.5-flash'
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Rule-based rejections at least this confident are final; the AI is only
+# consulted for the rest
+RULE_REJECTION_CONFIDENCE = 0.9
+
+# Key fields summarized for each document type, as (label, field, value prefix)
+_SUMMARY_FIELDS = {
+    "hospital_bill": (
+        ("Hospital", "hospital_name", ""),
+        ("Patient", "patient_name", ""),
+        ("Total Amount", "total_amount", "₹"),
+        ("Service Date", "date_of_service", ""),
+    ),
+    "discharge_summary": (
+        ("Patient", "patient_name", ""),
+        ("Diagnosis", "diagnosis", ""),
+        ("Admission", "admission_date", ""),
+        ("Discharge", "discharge_date", ""),
+    ),
+    "insurance_card": (
+        ("Card Holder", "card_holder_name", ""),
+        ("Policy Number", "policy_number", ""),
+        ("Sum Insured", "sum_insured", "₹"),
+        ("Insurance Company", "insurance_company", ""),
+    ),
+}
+
 class DecisionEngine:
     """
     Service for making claim approval/rejection decisions based on extracted data and validation results.
     """
     
     def __init__(self):
-        # Configure Gemini API
-        api_key = os.getenv('GEMINI_API_KEY', 'your-api-key-here')
-        if api_key != 'your-api-key-here':
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
-        else:
-            self.model = None
+        # Shared Gemini model, or None without an API key; it is asked for a
+        # bare JSON object, so the reply needs no extraction
+        self.model = get_gemini(_MODEL_NAME, _DECISION_INSTRUCTION, 'application/json')
+        
+        # AI decisions for claims seen before, by prompt and full claim data
+        self._memory_cache = result_cache.MemoryCache()
+        
+        # Bounds the Gemini calls in flight, to stay within the API rate limit
+        self._llm_semaphore = asyncio.Semaphore(int(os.getenv('GEMINI_CONCURRENCY', '4')))
         
         # Define decision rules
         self.approval_rules = {
@@ -34,6 +96,10 @@ class DecisionEngine:
             # First, apply rule-based decision logic
             rule_decision = self._rule_based_decision(extracted_data, validation_result)
             
+            # A clear-cut rejection (missing bill, amount over the limit) stands
+            if rule_decision.status == "rejected" and rule_decision.confidence >= RULE_REJECTION_CONFIDENCE:
+                return rule_decision
+            
             # If LLM is available, get AI-assisted decision
             if self.model is not None:
                 ai_decision = await self._ai_assisted_decision(extracted_data, validation_result, rule_decision)
@@ -54,6 +120,8 @@ class DecisionEngine:
         """
         Make decision based on predefined rules.
         """
+        avg_confidence, max_confidence, has_patient_info, has_amount_info = self._extract_features(extracted_data)
+        
         # Check for critical missing documents
         if validation_result.missing_documents:
             missing_critical = any("hospital_bill" in missing for missing in validation_result.missing_documents)
@@ -74,7 +142,6 @@ class DecisionEngine:
             )
         
         # Check extraction confidence
-        avg_confidence = sum(data.extraction_confidence for data in extracted_data) / len(extracted_data)
         if avg_confidence < self.approval_rules["min_confidence"]:
             return ClaimDecision(
                 status="rejected",
@@ -92,8 +159,9 @@ class DecisionEngine:
                 recommended_amount=self.approval_rules["max_claim_amount"]
             )
         
-        # Check for basic claim validity
-        if not self._is_claim_valid(extracted_data):
+        # Check for basic claim validity: a document with reasonable
+        # confidence and the essential information
+        if not (max_confidence > 0.3 and has_patient_info and has_amount_info):
             return ClaimDecision(
                 status="rejected",
                 reason="Claim does not meet basic validity requirements",
@@ -123,9 +191,6 @@ class DecisionEngine:
             data_summary = self._prepare_data_summary(extracted_data, validation_result)
             
             prompt = f"""
-            You are a medical insurance claim processor. Based on the following information, 
-            make a decision on whether to approve or reject this claim.
-            
             Rule-based decision: {rule_decision.status} - {rule_decision.reason}
             
             Extracted Data Summary:
@@ -135,29 +200,27 @@ class DecisionEngine:
             - Missing documents: {validation_result.missing_documents}
             - Discrepancies: {validation_result.discrepancies}
             - Warnings: {validation_result.warnings}
-            
-            Consider the following factors:
-            1. Document completeness and authenticity
-            2. Data consistency across documents
-            3. Medical necessity and reasonableness of charges
-            4. Policy coverage and limits
-            
-            Respond with a JSON object in this format:
-            {{
-                "status": "approved" or "rejected" or "pending",
-                "reason": "Detailed explanation for the decision",
-                "confidence": 0.85,
-                "recommended_amount": 12345.67
-            }}
-            
-            Return only the JSON object, no additional text.
             """
             
-            response = self.model.generate_content(prompt)
+            # Only a claim with exactly the same documents and extracted data
+            # reuses a decision; the prompt summary alone can match other claims
+            claim_data = orjson.dumps([data.model_dump() for data in extracted_data],
+                                      option=orjson.OPT_SORT_KEYS, default=str).decode()
+            cache_key = result_cache.make_key('decision', _PROMPT_VERSION, _MODEL_NAME, prompt, claim_data)
+            cached = self._memory_cache.get(cache_key) or await result_cache.get(cache_key)
+            if cached is not None:
+                self._memory_cache.set(cache_key, cached)
+                return ClaimDecision(**cached)
+            
+            async with self._llm_semaphore:
+                response = await self.model.generate_content_async(prompt)
             ai_result = self._parse_ai_response(response.text)
             
             if ai_result:
-                return ClaimDecision(**ai_result)
+                decision = ClaimDecision(**ai_result)
+                self._memory_cache.set(cache_key, ai_result)
+                await result_cache.set(cache_key, ai_result)
+                return decision
             else:
                 # Fallback to rule-based decision if AI parsing fails
                 return rule_decision
@@ -174,27 +237,14 @@ class DecisionEngine:
         summary_parts = []
         
         for data in extracted_data:
-            doc_summary = f"\n{data.document_type.upper()}:"
-            doc_summary += f"\n  Confidence: {data.extraction_confidence:.2f}"
+            doc_summary = f"\n{data.document_type.upper()}:\n  Confidence: {data.extraction_confidence:.2f}"
             
             # Add key fields based on document type
-            if data.document_type == "hospital_bill":
-                doc_summary += f"\n  Hospital: {data.data.get('hospital_name', 'N/A')}"
-                doc_summary += f"\n  Patient: {data.data.get('patient_name', 'N/A')}"
-                doc_summary += f"\n  Total Amount: ₹{data.data.get('total_amount', 'N/A')}"
-                doc_summary += f"\n  Service Date: {data.data.get('date_of_service', 'N/A')}"
-                
-            elif data.document_type == "discharge_summary":
-                doc_summary += f"\n  Patient: {data.data.get('patient_name', 'N/A')}"
-                doc_summary += f"\n  Diagnosis: {data.data.get('diagnosis', 'N/A')}"
-                doc_summary += f"\n  Admission: {data.data.get('admission_date', 'N/A')}"
-                doc_summary += f"\n  Discharge: {data.data.get('discharge_date', 'N/A')}"
-                
-            elif data.document_type == "insurance_card":
-                doc_summary += f"\n  Card Holder: {data.data.get('card_holder_name', 'N/A')}"
-                doc_summary += f"\n  Policy Number: {data.data.get('policy_number', 'N/A')}"
-                doc_summary += f"\n  Sum Insured: ₹{data.data.get('sum_insured', 'N/A')}"
-                doc_summary += f"\n  Insurance Company: {data.data.get('insurance_company', 'N/A')}"
+            fields = data.data
+            doc_summary += "".join(
+                f"\n  {label}: {prefix}{fields.get(field, 'N/A')}"
+                for label, field, prefix in _SUMMARY_FIELDS.get(data.document_type, ())
+            )
             
             summary_parts.append(doc_summary)
         
@@ -205,16 +255,20 @@ class DecisionEngine:
         Parse AI response to extract decision data.
         """
         try:
-            import json
-            import re
-            
-            # Try to find JSON in the response
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                return json.loads(json_str)
-            else:
+            start = response_text.find('{')
+            if start == -1:
                 return None
+            
+            # The model is asked for bare JSON, which orjson parses directly
+            try:
+                return orjson.loads(response_text[start:])
+            except orjson.JSONDecodeError:
+                pass
+            
+            # Otherwise parse the JSON object starting at the first brace;
+            # raw_decode stops at its closing brace, so trailing text does not matter
+            decision, _ = _JSON_DECODER.raw_decode(response_text, start)
+            return decision
         except json.JSONDecodeError:
             return None
     
@@ -229,25 +283,33 @@ class DecisionEngine:
                     return float(amount)
         return None
     
-    def _is_claim_valid(self, extracted_data: List[ExtractedData]) -> bool:
+    def _extract_features(self, extracted_data: List[ExtractedData]) -> Tuple[float, float, bool, bool]:
         """
-        Check if the claim meets basic validity requirements.
+        Collect, in one pass over the documents, the average and highest
+        extraction confidence and whether patient and amount details were found.
         """
-        # Check if we have at least one document with reasonable confidence
-        has_valid_doc = any(data.extraction_confidence > 0.3 for data in extracted_data)
-        
-        # Check if we have essential information
+        total_confidence = 0.0
+        max_confidence = 0.0
         has_patient_info = False
         has_amount_info = False
         
         for data in extracted_data:
-            if data.document_type in ["hospital_bill", "discharge_summary"]:
-                if data.data.get("patient_name"):
-                    has_patient_info = True
+            confidence = data.extraction_confidence
+            total_confidence += confidence
+            if confidence > max_confidence:
+                max_confidence = confidence
             
-            if data.document_type == "hospital_bill":
-                if data.data.get("total_amount"):
+            document_type = data.document_type
+            if document_type == "hospital_bill":
+                fields = data.data
+                if fields.get("patient_name"):
+                    has_patient_info = True
+                if fields.get("total_amount"):
                     has_amount_info = True
+            elif document_type == "discharge_summary":
+                if data.data.get("patient_name"):
+                    has_patient_info = True
         
-        return has_valid_doc and has_patient_info and has_amount_info
+        avg_confidence = total_confidence / max(len(extracted_data), 1)
+        return avg_confidence, max_confidence, has_patient_info, has_amount_info
 
@@ -1,18 +1,79 @@
-import google.generativeai as genai
+import asyncio
 import os
-from typing import Literal
+from typing import List, Literal, Optional, Tuple
+from src import cache as result_cache
+from src.llm_client import get_gemini
 from src.models.data_models import ClassifiedDocument
 
+# Phrases (lowercase) that only appear in one kind of document
+_ANCHOR_KEYWORDS = {
+    'discharge summary': 'discharge_summary',
+    'final diagnosis': 'discharge_summary',
+    'condition at discharge': 'discharge_summary',
+    'course in hospital': 'discharge_summary',
+    'hospital course': 'discharge_summary',
+    'discharge advice': 'discharge_summary',
+    'tax invoice': 'hospital_bill',
+    'bill no': 'hospital_bill',
+    'invoice no': 'hospital_bill',
+    'grand total': 'hospital_bill',
+    'net amount': 'hospital_bill',
+    'amount payable': 'hospital_bill',
+    'sum insured': 'insurance_card',
+    'policy holder': 'insurance_card',
+    'member id': 'insurance_card',
+    'valid till': 'insurance_card',
+    'valid upto': 'insurance_card',
+}
+
+# Anchor hits needed to skip the LLM classifier
+_MIN_ANCHOR_HITS = 2
+
+# Rule-based classification keywords for each type, in tie-break order
+_CATEGORY_KEYWORDS = (
+    ("hospital_bill", frozenset(['bill', 'invoice', 'charges', 'amount', 'total', 'hospital', 'medical'])),
+    ("discharge_summary", frozenset(['discharge', 'summary', 'diagnosis', 'admission', 'patient'])),
+    ("insurance_card", frozenset(['insurance', 'policy', 'card', 'coverage', 'premium'])),
+)
+
+# Static part of the classification prompt, sent once as the model's system
+# instruction so each request carries only the document itself
+_CLASSIFIER_INSTRUCTION = """
+You are a medical document classifier. Analyze the given document and classify it into one of these categories:
+- hospital_bill: Medical bills, invoices, or billing statements
+- discharge_summary: Hospital discharge summaries or medical reports
+- insurance_card: Insurance cards or policy documents
+- other: Any other type of document
+
+Respond with only the classification category (hospital_bill, discharge_summary, insurance_card, or other) and a confidence score between 0 and 1, separated by a comma.
+Example: hospital_bill,0.95
+"""
+
+# Bump when the classification prompt changes, to invalidate cached results
+_PROMPT_VERSION = "1"
+
+_MODEL_NAME = 'gemini-1.5-flash'
+
 class DocumentClassifier:
     def __init__(self):
-        # Configure Gemini API
-        # Note: In production, use environment variables for API keys
-        api_key = os.getenv('GEMINI_API_KEY', 'your-api-key-here')
-        if api_key != 'your-api-key-here':
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
-        else:
-            self.model = None
+        # Shared Gemini model, or None without an API key
+        self.model = get_gemini(_MODEL_NAME, _CLASSIFIER_INSTRUCTION)
+        
+        # Keyword scans only read the start of the text, where the document
+        # identifies itself (the LLM is shown the first 2000 characters)
+        self.max_scan_chars = 4000
+        
+        # LLM classifications of documents seen before, by prompt
+        self._memory_cache = result_cache.MemoryCache()
+        
+        # Bounds the Gemini calls in flight, to stay within the API rate limit
+        self._llm_semaphore = asyncio.Semaphore(int(os.getenv('GEMINI_CONCURRENCY', '4')))
+    
+    async def classify_batch(self, items: List[Tuple[str, str, str]]) -> List[ClassifiedDocument]:
+        """
+        Classify (file_id, filename, text_content) items concurrently, keeping their order.
+        """
+        return list(await asyncio.gather(*(self.classify(*item) for item in items)))
     
     async def classify(self, file_id: str, filename: str, text_content: str) -> ClassifiedDocument:
         """
@@ -21,9 +82,17 @@ class DocumentClassifier:
         # Use the passed file_id
         # file_id = filename  # Simplified for now
         
+        # Lowercase once for every keyword scan below
+        text_lower = text_content[:self.max_scan_chars].lower()
+        
         # If no model is available, use rule-based classification
         if self.model is None:
-            return self._rule_based_classify(file_id, filename, text_content)
+            return self._rule_based_classify(file_id, filename, text_content, text_lower)
+        
+        # Documents with clear anchor phrases need no LLM call
+        anchored = self._anchor_classify(file_id, text_lower)
+        if anchored is not None:
+            return anchored
         
         try:
             # Use LLM for classification
@@ -31,34 +100,56 @@ class DocumentClassifier:
         except Exception as e:
             print(f"LLM classification failed: {e}")
             # Fallback to rule-based classification
-            return self._rule_based_classify(file_id, filename, text_content)
+            return self._rule_based_classify(file_id, filename, text_content, text_lower)
     
-    def _rule_based_classify(self, file_id: str, filename: str, text_content: str) -> ClassifiedDocument:
+    def _anchor_classify(self, file_id: str, text_lower: str) -> Optional[ClassifiedDocument]:
+        """
+        Classify a document from the anchor phrases in its lowercased text,
+        or return None if they are too few or point to more than one
+        document type.
+        """
+        hits = {}
+        for keyword, doc_type in _ANCHOR_KEYWORDS.items():
+            count = text_lower.count(keyword)
+            if count:
+                hits[doc_type] = hits.get(doc_type, 0) + count
+        
+        if len(hits) != 1:
+            return None
+        
+        doc_type, count = hits.popitem()
+        if count < _MIN_ANCHOR_HITS:
+            return None
+        
+        return ClassifiedDocument(
+            file_id=file_id,
+            document_type=doc_type,
+            confidence=0.95
+        )
+    
+    def _rule_based_classify(self, file_id: str, filename: str, text_content: str,
+                             text_lower: Optional[str] = None) -> ClassifiedDocument:
         """
         Rule-based document classification as fallback.
+        
+        text_lower, if given, is the lowercased start of text_content
+        computed by the caller.
         """
         filename_lower = filename.lower()
-        text_lower = text_content.lower()
-        
-        # Check for hospital bill indicators
-        bill_keywords = ['bill', 'invoice', 'charges', 'amount', 'total', 'hospital', 'medical']
-        discharge_keywords = ['discharge', 'summary', 'diagnosis', 'admission', 'patient']
-        insurance_keywords = ['insurance', 'policy', 'card', 'coverage', 'premium']
-        
-        bill_score = sum(1 for keyword in bill_keywords if keyword in filename_lower or keyword in text_lower)
-        discharge_score = sum(1 for keyword in discharge_keywords if keyword in filename_lower or keyword in text_lower)
-        insurance_score = sum(1 for keyword in insurance_keywords if keyword in filename_lower or keyword in text_lower)
-        
-        # Determine document type based on highest score
-        if bill_score >= discharge_score and bill_score >= insurance_score:
-            doc_type = "hospital_bill"
-            confidence = min(0.9, bill_score / len(bill_keywords))
-        elif discharge_score >= insurance_score:
-            doc_type = "discharge_summary"
-            confidence = min(0.9, discharge_score / len(discharge_keywords))
-        elif insurance_score > 0:
-            doc_type = "insurance_card"
-            confidence = min(0.9, insurance_score / len(insurance_keywords))
+        if text_lower is None:
+            text_lower = text_content[:self.max_scan_chars].lower()
+        
+        # Count the keywords of each type found in the filename or text
+        scores = [
+            sum(1 for keyword in keywords if keyword in filename_lower or keyword in text_lower)
+            for _, keywords in _CATEGORY_KEYWORDS
+        ]
+        
+        # Determine document type based on highest score; max keeps the first on ties
+        best = max(range(len(_CATEGORY_KEYWORDS)), key=scores.__getitem__)
+        if scores[best] > 0:
+            doc_type, keywords = _CATEGORY_KEYWORDS[best]
+            confidence = min(0.9, scores[best] / len(keywords))
         else:
             doc_type = "other"
             confidence = 0.1
@@ -74,23 +165,22 @@ class DocumentClassifier:
         Use LLM for document classification.
         """
         prompt = f"""
-        You are a medical document classifier. Analyze the following document and classify it into one of these categories:
-        - hospital_bill: Medical bills, invoices, or billing statements
-        - discharge_summary: Hospital discharge summaries or medical reports
-        - insurance_card: Insurance cards or policy documents
-        - other: Any other type of document
-        
         Document filename: {filename}
         
         Document content (first 2000 characters):
         {text_content[:2000]}
-        
-        Respond with only the classification category (hospital_bill, discharge_summary, insurance_card, or other) and a confidence score between 0 and 1, separated by a comma.
-        Example: hospital_bill,0.95
         """
         
+        # Reprocessed documents get the earlier answer without an LLM call
+        cache_key = result_cache.make_key('classify', _PROMPT_VERSION, _MODEL_NAME, prompt)
+        cached = self._memory_cache.get(cache_key) or await result_cache.get(cache_key)
+        if cached is not None:
+            self._memory_cache.set(cache_key, cached)
+            return ClassifiedDocument(file_id=file_id, **cached)
+        
         try:
-            response = self.model.generate_content(prompt)
+            async with self._llm_semaphore:
+                response = await self.model.generate_content_async(prompt)
             result = response.text.strip()
             
             # Parse the response
@@ -105,6 +195,10 @@ class DocumentClassifier:
                     doc_type = "other"
                     confidence = 0.1
                 
+                result = {"document_type": doc_type, "confidence": confidence}
+                self._memory_cache.set(cache_key, result)
+                await result_cache.set(cache_key, result)
+                
                 return ClassifiedDocument(
                     file_id=file_id,
                     document_type=doc_type,
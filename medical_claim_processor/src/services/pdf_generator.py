@@ -2,13 +2,215 @@ from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.colors import HexColor, black, white, red, green, orange
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, HRFlowable
 from reportlab.platypus.frames import Frame
 from reportlab.platypus.doctemplate import PageTemplate, BaseDocTemplate
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
 from datetime import datetime
+import copy
+from functools import lru_cache
 import io
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO, Iterator, Optional
+
+# Display names of the document fields shown in the report
+_FIELD_MAPPING = {
+    'hospital_name': 'Hospital Name',
+    'patient_name': 'Patient Name',
+    'card_holder_name': 'Card Holder Name',
+    'total_amount': 'Total Amount',
+    'sum_insured': 'Sum Insured',
+    'admission_date': 'Admission Date',
+    'discharge_date': 'Discharge Date',
+    'date_of_service': 'Service Date',
+    'diagnosis': 'Diagnosis',
+    'doctor_name': 'Doctor Name',
+    'insurance_company': 'Insurance Company',
+    'policy_number': 'Policy Number',
+    'validity_date': 'Validity Date'
+}
+
+# Fields whose numeric values are shown as rupee amounts
+_CURRENCY_FIELDS = frozenset(['total_amount', 'sum_insured'])
+
+# Icon and paragraph style for each claim decision status
+_STATUS_DISPLAY = {
+    'APPROVED': ('✅', 'DecisionApproved'),
+    'REJECTED': ('❌', 'DecisionRejected'),
+    'PENDING': ('⏳', 'DecisionPending'),
+}
+_UNKNOWN_STATUS_DISPLAY = ('❓', 'DecisionPending')
+
+# Headings of the validation issue lists
+_MISSING_DOCUMENTS_TITLE = "<b>❌ Missing Documents:</b>"
+_DISCREPANCIES_TITLE = "<b>⚠️ Discrepancies Found:</b>"
+_WARNINGS_TITLE = "<b>⚠️ Warnings:</b>"
+
+# Table styles shared by every report; setStyle only reads them
+_DECISION_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), HexColor('#f8fafc')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('GRID', (0, 0), (-1, -1), 1, HexColor('#e2e8f0')),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+_SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), HexColor('#f8fafc')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), black),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('GRID', (0, 0), (-1, -1), 1, HexColor('#e2e8f0')),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+_DOCUMENT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), HexColor('#f8fafc')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, HexColor('#e2e8f0')),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+
+@lru_cache(maxsize=None)
+def _build_styles():
+    """
+    Build the report stylesheet once; every PDFGenerator shares it, as
+    nothing modifies the styles after they are built.
+    """
+    styles = getSampleStyleSheet()
+    
+    # Title style
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Title'],
+        fontSize=24,
+        spaceAfter=30,
+        textColor=HexColor('#1e40af'),
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+    
+    # Subtitle style
+    styles.add(ParagraphStyle(
+        name='CustomSubtitle',
+        parent=styles['Normal'],
+        fontSize=14,
+        spaceAfter=20,
+        textColor=HexColor('#64748b'),
+        alignment=TA_CENTER,
+        fontName='Helvetica'
+    ))
+    
+    # Section header style
+    styles.add(ParagraphStyle(
+        name='SectionHeader',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=12,
+        spaceBefore=20,
+        textColor=HexColor('#1e40af'),
+        fontName='Helvetica-Bold',
+        borderWidth=0,
+        borderColor=HexColor('#e2e8f0'),
+        borderPadding=8,
+        backColor=HexColor('#f8fafc')
+    ))
+    
+    # Decision style for approved
+    styles.add(ParagraphStyle(
+        name='DecisionApproved',
+        parent=styles['Normal'],
+        fontSize=18,
+        spaceAfter=15,
+        textColor=HexColor('#16a34a'),
+        fontName='Helvetica-Bold',
+        alignment=TA_CENTER,
+        backColor=HexColor('#f0fdf4'),
+        borderWidth=1,
+        borderColor=HexColor('#16a34a'),
+        borderPadding=10
+    ))
+    
+    # Decision style for rejected
+    styles.add(ParagraphStyle(
+        name='DecisionRejected',
+        parent=styles['Normal'],
+        fontSize=18,
+        spaceAfter=15,
+        textColor=HexColor('#dc2626'),
+        fontName='Helvetica-Bold',
+        alignment=TA_CENTER,
+        backColor=HexColor('#fef2f2'),
+        borderWidth=1,
+        borderColor=HexColor('#dc2626'),
+        borderPadding=10
+    ))
+    
+    # Decision style for pending
+    styles.add(ParagraphStyle(
+        name='DecisionPending',
+        parent=styles['Normal'],
+        fontSize=18,
+        spaceAfter=15,
+        textColor=HexColor('#d97706'),
+        fontName='Helvetica-Bold',
+        alignment=TA_CENTER,
+        backColor=HexColor('#fffbeb'),
+        borderWidth=1,
+        borderColor=HexColor('#d97706'),
+        borderPadding=10
+    ))
+    
+    # Info style
+    styles.add(ParagraphStyle(
+        name='InfoText',
+        parent=styles['Normal'],
+        fontSize=10,
+        textColor=HexColor('#64748b'),
+        alignment=TA_CENTER,
+        spaceAfter=10
+    ))
+    
+    return styles
+
+@lru_cache(maxsize=None)
+def _build_static_paragraphs():
+    """
+    Parse the paragraphs that are the same in every report once.
+    
+    Each report adds shallow copies of them, as ReportLab stores layout
+    state on a flowable while building, and reports are built concurrently.
+    """
+    styles = _build_styles()
+    return {
+        'title': Paragraph("Claim Processing Result", styles['CustomTitle']),
+        'subtitle': Paragraph("HealthPay AI Engine", styles['CustomSubtitle']),
+        'footer': Paragraph(
+            "This report was generated by HealthPay AI Engine using advanced machine learning algorithms.<br/>"
+            "For questions or concerns, please contact your healthcare provider or insurance company.<br/><br/>"
+            "<b>Confidential:</b> This document contains sensitive medical and financial information.",
+            styles['InfoText']
+        ),
+    }
 
 class PDFGenerator:
     """
@@ -16,110 +218,48 @@ class PDFGenerator:
     """
     
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
-    
-    def _setup_custom_styles(self):
-        """Setup custom styles for the PDF."""
-        # Title style
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Title'],
-            fontSize=24,
-            spaceAfter=30,
-            textColor=HexColor('#1e40af'),
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        ))
-        
-        # Subtitle style
-        self.styles.add(ParagraphStyle(
-            name='CustomSubtitle',
-            parent=self.styles['Normal'],
-            fontSize=14,
-            spaceAfter=20,
-            textColor=HexColor('#64748b'),
-            alignment=TA_CENTER,
-            fontName='Helvetica'
-        ))
-        
-        # Section header style
-        self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=self.styles['Heading1'],
-            fontSize=16,
-            spaceAfter=12,
-            spaceBefore=20,
-            textColor=HexColor('#1e40af'),
-            fontName='Helvetica-Bold',
-            borderWidth=0,
-            borderColor=HexColor('#e2e8f0'),
-            borderPadding=8,
-            backColor=HexColor('#f8fafc')
-        ))
-        
-        # Decision style for approved
-        self.styles.add(ParagraphStyle(
-            name='DecisionApproved',
-            parent=self.styles['Normal'],
-            fontSize=18,
-            spaceAfter=15,
-            textColor=HexColor('#16a34a'),
-            fontName='Helvetica-Bold',
-            alignment=TA_CENTER,
-            backColor=HexColor('#f0fdf4'),
-            borderWidth=1,
-            borderColor=HexColor('#16a34a'),
-            borderPadding=10
-        ))
-        
-        # Decision style for rejected
-        self.styles.add(ParagraphStyle(
-            name='DecisionRejected',
-            parent=self.styles['Normal'],
-            fontSize=18,
-            spaceAfter=15,
-            textColor=HexColor('#dc2626'),
-            fontName='Helvetica-Bold',
-            alignment=TA_CENTER,
-            backColor=HexColor('#fef2f2'),
-            borderWidth=1,
-            borderColor=HexColor('#dc2626'),
-            borderPadding=10
-        ))
-        
-        # Decision style for pending
-        self.styles.add(ParagraphStyle(
-            name='DecisionPending',
-            parent=self.styles['Normal'],
-            fontSize=18,
-            spaceAfter=15,
-            textColor=HexColor('#d97706'),
-            fontName='Helvetica-Bold',
-            alignment=TA_CENTER,
-            backColor=HexColor('#fffbeb'),
-            borderWidth=1,
-            borderColor=HexColor('#d97706'),
-            borderPadding=10
-        ))
-        
-        # Info style
-        self.styles.add(ParagraphStyle(
-            name='InfoText',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor=HexColor('#64748b'),
-            alignment=TA_CENTER,
-            spaceAfter=10
-        ))
+        self.styles = _build_styles()
     
-    def generate_claim_report(self, results: Dict[str, Any]) -> bytes:
+    def generate_claim_report(self, results: Dict[str, Any], output: Optional[BinaryIO] = None) -> Optional[bytes]:
         """
         Generate a professional PDF report for claim processing results.
+        
+        If output is given, the report is written straight into it (an open
+        file, for instance) and None is returned; otherwise its bytes are.
+        """
+        if output is not None:
+            self._build_report(results, output)
+            return None
+        
+        buffer = io.BytesIO()
+        self._build_report(results, buffer)
+        return buffer.getvalue()
+    
+    def stream_claim_report(self, results: Dict[str, Any], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Generate the PDF report and return an iterator over its bytes in chunks.
+        
+        The report is built before this returns, so build errors surface here;
+        the chunks are then sliced from the buffer without copying it whole.
+        ReportLab writes the cross-reference table last, so a PDF cannot be
+        sent before it is complete.
         """
         buffer = io.BytesIO()
+        self._build_report(results, buffer)
+        return self._iter_chunks(buffer, chunk_size)
+    
+    def _iter_chunks(self, buffer: io.BytesIO, chunk_size: int) -> Iterator[bytes]:
+        """Yield the contents of buffer in chunks of up to chunk_size bytes."""
+        with buffer.getbuffer() as view:
+            for start in range(0, len(view), chunk_size):
+                yield bytes(view[start:start + chunk_size])
+    
+    def _build_report(self, results: Dict[str, Any], output):
+        """
+        Build the PDF report for claim processing results into a file-like output.
+        """
         doc = SimpleDocTemplate(
-            buffer,
+            output,
             pagesize=A4,
             rightMargin=72,
             leftMargin=72,
@@ -148,20 +288,15 @@ class PDFGenerator:
         story.extend(self._create_footer())
         
         doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
     
     def _create_header(self):
         """Create the PDF header."""
         elements = []
         
-        # Title
-        title = Paragraph("Claim Processing Result", self.styles['CustomTitle'])
-        elements.append(title)
-        
-        # Subtitle
-        subtitle = Paragraph("HealthPay AI Engine", self.styles['CustomSubtitle'])
-        elements.append(subtitle)
+        # Title and subtitle
+        static_paragraphs = _build_static_paragraphs()
+        elements.append(copy.copy(static_paragraphs['title']))
+        elements.append(copy.copy(static_paragraphs['subtitle']))
         
         # Generation info
         generation_time = datetime.now().strftime("%B %d, %Y at %I:%M %p")
@@ -182,18 +317,9 @@ class PDFGenerator:
         
         # Decision status
         status = decision.get('status', 'unknown').upper()
-        if status == 'APPROVED':
-            decision_text = f"✅ CLAIM {status}"
-            style = self.styles['DecisionApproved']
-        elif status == 'REJECTED':
-            decision_text = f"❌ CLAIM {status}"
-            style = self.styles['DecisionRejected']
-        elif status == 'PENDING':
-            decision_text = f"⏳ CLAIM {status}"
-            style = self.styles['DecisionPending']
-        else:
-            decision_text = f"❓ CLAIM {status}"
-            style = self.styles['DecisionPending']
+        icon, style_name = _STATUS_DISPLAY.get(status, _UNKNOWN_STATUS_DISPLAY)
+        decision_text = f"{icon} CLAIM {status}"
+        style = self.styles[style_name]
         
         decision_para = Paragraph(decision_text, style)
         elements.append(decision_para)
@@ -210,20 +336,7 @@ class PDFGenerator:
             decision_data.append(['Recommended Amount:', formatted_amount])
         
         decision_table = Table(decision_data, colWidths=[2*inch, 4*inch])
-        decision_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), HexColor('#f8fafc')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('GRID', (0, 0), (-1, -1), 1, HexColor('#e2e8f0')),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        decision_table.setStyle(_DECISION_TABLE_STYLE)
         
         elements.append(decision_table)
         elements.append(Spacer(1, 20))
@@ -252,20 +365,7 @@ class PDFGenerator:
         
         if summary_data:
             summary_table = Table(summary_data, colWidths=[2.5*inch, 1.5*inch])
-            summary_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), HexColor('#f8fafc')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), black),
-                ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-                ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 11),
-                ('GRID', (0, 0), (-1, -1), 1, HexColor('#e2e8f0')),
-                ('LEFTPADDING', (0, 0), (-1, -1), 8),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ]))
+            summary_table.setStyle(_SUMMARY_TABLE_STYLE)
             
             elements.append(summary_table)
             elements.append(Spacer(1, 20))
@@ -299,47 +399,19 @@ class PDFGenerator:
             if doc_data:
                 data_rows = []
                 
-                # Common fields mapping
-                field_mapping = {
-                    'hospital_name': 'Hospital Name',
-                    'patient_name': 'Patient Name',
-                    'card_holder_name': 'Card Holder Name',
-                    'total_amount': 'Total Amount',
-                    'sum_insured': 'Sum Insured',
-                    'admission_date': 'Admission Date',
-                    'discharge_date': 'Discharge Date',
-                    'date_of_service': 'Service Date',
-                    'diagnosis': 'Diagnosis',
-                    'doctor_name': 'Doctor Name',
-                    'insurance_company': 'Insurance Company',
-                    'policy_number': 'Policy Number',
-                    'validity_date': 'Validity Date'
-                }
-                
                 for key, value in doc_data.items():
-                    if value and key in field_mapping:
-                        display_name = field_mapping[key]
-                        if key in ['total_amount', 'sum_insured'] and isinstance(value, (int, float)):
+                    if value and key in _FIELD_MAPPING:
+                        display_name = _FIELD_MAPPING[key]
+                        if key in _CURRENCY_FIELDS and isinstance(value, (int, float)):
                             display_value = f"₹{value:,.2f}"
                         else:
-                            display_value = str(value)
+                            # Most extracted values are already strings
+                            display_value = value if type(value) is str else str(value)
                         data_rows.append([display_name + ':', display_value])
                 
                 if data_rows:
                     doc_table = Table(data_rows, colWidths=[2*inch, 3*inch])
-                    doc_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (0, -1), HexColor('#f8fafc')),
-                        ('TEXTCOLOR', (0, 0), (-1, -1), black),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                        ('FONTSIZE', (0, 0), (-1, -1), 10),
-                        ('GRID', (0, 0), (-1, -1), 1, HexColor('#e2e8f0')),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                        ('TOPPADDING', (0, 0), (-1, -1), 4),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-                    ]))
+                    doc_table.setStyle(_DOCUMENT_TABLE_STYLE)
                     
                     elements.append(doc_table)
             
@@ -370,32 +442,19 @@ class PDFGenerator:
             )
             elements.append(success_text)
         else:
-            # Missing documents
-            if missing_docs:
-                missing_header = Paragraph("<b>❌ Missing Documents:</b>", self.styles['Normal'])
-                elements.append(missing_header)
-                for missing in missing_docs:
-                    missing_item = Paragraph(f"• {missing}", self.styles['Normal'])
-                    elements.append(missing_item)
-                elements.append(Spacer(1, 10))
-            
-            # Discrepancies
-            if discrepancies:
-                discrepancy_header = Paragraph("<b>⚠️ Discrepancies Found:</b>", self.styles['Normal'])
-                elements.append(discrepancy_header)
-                for discrepancy in discrepancies:
-                    discrepancy_item = Paragraph(f"• {discrepancy}", self.styles['Normal'])
-                    elements.append(discrepancy_item)
-                elements.append(Spacer(1, 10))
-            
-            # Warnings
-            if warnings:
-                warning_header = Paragraph("<b>⚠️ Warnings:</b>", self.styles['Normal'])
-                elements.append(warning_header)
-                for warning in warnings:
-                    warning_item = Paragraph(f"• {warning}", self.styles['Normal'])
-                    elements.append(warning_item)
-                elements.append(Spacer(1, 10))
+            # One paragraph per list, its items separated by line breaks,
+            # so the markup is parsed once rather than once per item
+            for title, items in (
+                (_MISSING_DOCUMENTS_TITLE, missing_docs),
+                (_DISCREPANCIES_TITLE, discrepancies),
+                (_WARNINGS_TITLE, warnings),
+            ):
+                if items:
+                    elements.append(Paragraph(
+                        "<br/>".join([title, *(f"• {item}" for item in items)]),
+                        self.styles['Normal']
+                    ))
+                    elements.append(Spacer(1, 10))
         
         elements.append(Spacer(1, 20))
         return elements
@@ -406,24 +465,14 @@ class PDFGenerator:
         
         elements.append(Spacer(1, 30))
         
-        # Separator line
-        line_data = [['', '']]
-        line_table = Table(line_data, colWidths=[6*inch])
-        line_table.setStyle(TableStyle([
-            ('LINEABOVE', (0, 0), (-1, 0), 2, HexColor('#e2e8f0')),
-        ]))
-        elements.append(line_table)
+        # Separator line, followed by the 16 points the line table used to take up
+        elements.append(HRFlowable(width="100%", thickness=2, color=HexColor('#e2e8f0'),
+                                   spaceBefore=0, spaceAfter=16))
         
         elements.append(Spacer(1, 10))
         
         # Footer text
-        footer_text = Paragraph(
-            "This report was generated by HealthPay AI Engine using advanced machine learning algorithms.<br/>"
-            "For questions or concerns, please contact your healthcare provider or insurance company.<br/><br/>"
-            "<b>Confidential:</b> This document contains sensitive medical and financial information.",
-            self.styles['InfoText']
-        )
-        elements.append(footer_text)
+        elements.append(copy.copy(_build_static_paragraphs()['footer']))
         
         return elements
 
@@ -1,7 +1,27 @@
-import subprocess
-import tempfile
-import os
-from typing import Optional
+import threading
+from typing import Optional, Union
+
+import pypdfium2 as pdfium
+
+# PDFium is not thread-safe, so a process parses one document at a time
+_pdfium_lock = threading.Lock()
+
+def read_pdf_text(pdf: Union[str, bytes]) -> str:
+    """
+    Extract the text of every page of a PDF, given its path or its bytes, with PDFium.
+    """
+    with _pdfium_lock:
+        document = pdfium.PdfDocument(pdf)
+        try:
+            pages = []
+            for page in document:
+                textpage = page.get_textpage()
+                pages.append(textpage.get_text_range().replace('\r\n', '\n'))
+                textpage.close()
+                page.close()
+            return '\n'.join(pages)
+        finally:
+            document.close()
 
 class TextExtractor:
     """
@@ -10,38 +30,23 @@ class TextExtractor:
     
     def extract_from_pdf(self, pdf_path: str) -> str:
         """
-        Extract text from a PDF file using pdftotext.
+        Extract text from a PDF file with PDFium, in process.
         """
         try:
-            result = subprocess.run(
-                ['pdftotext', pdf_path, '-'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            return result.stdout
-        except subprocess.CalledProcessError as e:
+            return read_pdf_text(pdf_path)
+        except (pdfium.PdfiumError, OSError) as e:
             print(f"Error extracting text from PDF: {e}")
             return ""
-        except FileNotFoundError:
-            print("pdftotext not found. Please install poppler-utils.")
-            return ""
     
     def extract_from_bytes(self, pdf_bytes: bytes) -> str:
         """
-        Extract text from PDF bytes by creating a temporary file.
+        Extract text from PDF bytes; PDFium reads them from memory, with no temporary file.
         """
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(pdf_bytes)
-            temp_file_path = temp_file.name
-        
         try:
-            text = self.extract_from_pdf(temp_file_path)
-            return text
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+            return read_pdf_text(pdf_bytes)
+        except pdfium.PdfiumError as e:
+            print(f"Error extracting text from PDF: {e}")
+            return ""
     
     def clean_text(self, text: str) -> str:
         """
@@ -50,16 +55,9 @@ class TextExtractor:
         if not text:
             return ""
         
-        # Remove excessive whitespace
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if line:  # Skip empty lines
-                cleaned_lines.append(line)
-        
-        return '\n'.join(cleaned_lines)
+        # Strip every line and skip the empty ones, without intermediate lists
+        stripped_lines = (line.strip() for line in text.split('\n'))
+        return '\n'.join(line for line in stripped_lines if line)
     
     def extract_and_clean(self, pdf_path: str) -> str:
         """
@@ -1,6 +1,63 @@
+from functools import lru_cache
 from typing import List, Dict, Any
+from rapidfuzz import fuzz, utils
 from src.models.data_models import ExtractedData, ValidationResult
 
+# Normalized hospital and insurer names at least this similar (0-100) are
+# taken to be the same, to allow for abbreviations and OCR noise
+_FUZZY_MATCH_THRESHOLD = 85
+
+# Document types that name the patient, in the order mismatches are reported
+_PERSON_NAME_DOCUMENTS = ("hospital_bill", "discharge_summary", "insurance_card")
+
+# Key fields whose absence is worth a warning, as (document type, ((field, message), ...))
+_WARNING_CHECKS = (
+    ("hospital_bill", (
+        ("total_amount", "Hospital bill missing total amount"),
+        ("patient_name", "Hospital bill missing patient name"),
+    )),
+    ("discharge_summary", (
+        ("diagnosis", "Discharge summary missing diagnosis"),
+        ("patient_name", "Discharge summary missing patient name"),
+    )),
+    ("insurance_card", (
+        ("policy_number", "Insurance card missing policy number"),
+        ("sum_insured", "Insurance card missing sum insured amount"),
+    )),
+)
+
+def _normalize_name(name: str) -> str:
+    """Lowercase a person's name and collapse its whitespace."""
+    return ' '.join(name.lower().split())
+
+# Claims come from a limited set of hospitals and insurers, so their
+# normalized names are cached; patient names rarely repeat and are not
+@lru_cache(maxsize=4096)
+def _normalize_hospital_name(name: str) -> str:
+    """Lowercase a hospital name and drop common words such as 'hospital' and 'medical'."""
+    normalized = name.lower()
+    normalized = normalized.replace('hospital', '').replace('medical', '').replace('centre', '').replace('center', '')
+    return ' '.join(normalized.split())
+
+@lru_cache(maxsize=4096)
+def _normalize_insurance_company(name: str) -> str:
+    """Lowercase an insurance company name and drop words such as 'insurance' and 'ltd'."""
+    normalized = name.lower().replace('insurance', '').replace('general', '').replace('ltd', '').replace('limited', '')
+    return ' '.join(normalized.split())
+
+def _fuzzy_match(normalized1: str, normalized2: str) -> bool:
+    """
+    Whether two normalized names are equal or similar enough, by rapidfuzz's
+    token sort ratio, to name the same organization.
+    
+    The token set ratio is not used, as it scores 100 whenever one name's words
+    are a subset of the other's, e.g. 'City Hospital' and 'New City Hospital'.
+    """
+    if normalized1 == normalized2:
+        return True
+    similarity = fuzz.token_sort_ratio(normalized1, normalized2, processor=utils.default_process)
+    return similarity >= _FUZZY_MATCH_THRESHOLD
+
 class ClaimValidator:
     """
     Service for validating extracted claim data for consistency and completeness.
@@ -14,9 +71,12 @@ class ClaimValidator:
         """
         Validate the extracted data for consistency and completeness.
         """
+        # Group data by document type once for the checks that compare documents
+        data_by_type = {data.document_type: data.data for data in extracted_data}
+        
         missing_documents = self._check_missing_documents(extracted_data)
-        discrepancies = self._check_discrepancies(extracted_data)
-        warnings = self._check_warnings(extracted_data)
+        discrepancies = self._check_discrepancies(data_by_type)
+        warnings = self._check_warnings(extracted_data, data_by_type)
         
         return ValidationResult(
             missing_documents=missing_documents,
@@ -37,22 +97,22 @@ class ClaimValidator:
         
         return missing
     
-    def _check_discrepancies(self, extracted_data: List[ExtractedData]) -> List[str]:
+    def _check_discrepancies(self, data_by_type: Dict[str, Dict[str, Any]]) -> List[str]:
         """
-        Check for discrepancies between documents.
+        Check for discrepancies between documents, given their data by document type.
         """
-        discrepancies = []
+        # Every check compares two types of document
+        if len(data_by_type) < 2:
+            return []
         
-        # Group data by document type
-        data_by_type = {}
-        for data in extracted_data:
-            data_by_type[data.document_type] = data.data
+        discrepancies = []
         
         # Check patient name consistency
         patient_names = []
-        for doc_type in ["hospital_bill", "discharge_summary", "insurance_card"]:
-            if doc_type in data_by_type:
-                name = data_by_type[doc_type].get("patient_name") or data_by_type[doc_type].get("card_holder_name")
+        for doc_type in _PERSON_NAME_DOCUMENTS:
+            fields = data_by_type.get(doc_type)
+            if fields is not None:
+                name = fields.get("patient_name") or fields.get("card_holder_name")
                 if name:
                     patient_names.append((doc_type, name))
         
@@ -104,7 +164,8 @@ class ClaimValidator:
         
         return discrepancies
     
-    def _check_warnings(self, extracted_data: List[ExtractedData]) -> List[str]:
+    def _check_warnings(self, extracted_data: List[ExtractedData],
+                        data_by_type: Dict[str, Dict[str, Any]]) -> List[str]:
         """
         Check for potential issues that are not critical but worth noting.
         """
@@ -116,30 +177,10 @@ class ClaimValidator:
                 warnings.append(f"Low confidence extraction for {data.document_type}: {data.extraction_confidence:.2f}")
         
         # Check for missing key fields
-        data_by_type = {}
-        for data in extracted_data:
-            data_by_type[data.document_type] = data.data
-        
-        if "hospital_bill" in data_by_type:
-            bill_data = data_by_type["hospital_bill"]
-            if not bill_data.get("total_amount"):
-                warnings.append("Hospital bill missing total amount")
-            if not bill_data.get("patient_name"):
-                warnings.append("Hospital bill missing patient name")
-        
-        if "discharge_summary" in data_by_type:
-            discharge_data = data_by_type["discharge_summary"]
-            if not discharge_data.get("diagnosis"):
-                warnings.append("Discharge summary missing diagnosis")
-            if not discharge_data.get("patient_name"):
-                warnings.append("Discharge summary missing patient name")
-        
-        if "insurance_card" in data_by_type:
-            insurance_data = data_by_type["insurance_card"]
-            if not insurance_data.get("policy_number"):
-                warnings.append("Insurance card missing policy number")
-            if not insurance_data.get("sum_insured"):
-                warnings.append("Insurance card missing sum insured amount")
+        for doc_type, field_checks in _WARNING_CHECKS:
+            data = data_by_type.get(doc_type)
+            if data is not None:
+                warnings.extend(message for field, message in field_checks if not data.get(field))
         
         return warnings
     
@@ -147,19 +188,8 @@ class ClaimValidator:
         """
         Check if patient names are similar enough to be considered the same person.
         """
-        if not names:
-            return True
-        
-        # Normalize names for comparison
-        normalized_names = []
-        for name in names:
-            # Convert to lowercase, remove extra spaces
-            normalized = ' '.join(name.lower().split())
-            normalized_names.append(normalized)
-        
-        # Check if all names are the same
-        first_name = normalized_names[0]
-        return all(name == first_name for name in normalized_names)
+        # All names match when they normalize to at most one distinct name
+        return len({_normalize_name(name) for name in names}) <= 1
     
     def _hospital_names_match(self, names: List[str]) -> bool:
         """
@@ -168,30 +198,11 @@ class ClaimValidator:
         if not names:
             return True
         
-        # Normalize hospital names
-        normalized_names = []
-        for name in names:
-            # Convert to lowercase, remove common words
-            normalized = name.lower()
-            # Remove common hospital suffixes/prefixes
-            normalized = normalized.replace('hospital', '').replace('medical', '').replace('centre', '').replace('center', '')
-            normalized = ' '.join(normalized.split())
-            normalized_names.append(normalized)
-        
-        # Check if core names match
-        first_name = normalized_names[0]
-        return all(name == first_name for name in normalized_names)
+        first_name, *other_names = [_normalize_hospital_name(name) for name in names]
+        return all(_fuzzy_match(first_name, name) for name in other_names)
     
     def _insurance_companies_match(self, company1: str, company2: str) -> bool:
         """
         Check if insurance company names refer to the same company.
         """
-        # Normalize company names
-        norm1 = company1.lower().replace('insurance', '').replace('general', '').replace('ltd', '').replace('limited', '')
-        norm2 = company2.lower().replace('insurance', '').replace('general', '').replace('ltd', '').replace('limited', '')
-        
-        norm1 = ' '.join(norm1.split())
-        norm2 = ' '.join(norm2.split())
-        
-        return norm1 == norm2
-
+        return _fuzzy_match(_normalize_insurance_company(company1), _normalize_insurance_company(company2))
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Run the app modules the way src/main.py does, with no Gemini key and a
+# throwaway result cache
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.pop('GEMINI_API_KEY', None)
+os.environ['RESULT_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(), 'result_cache.sqlite3')
@@ -0,0 +1,37 @@
+import asyncio
+import os
+import stat
+
+from src import cache
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_default_cache_is_private(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    monkeypatch.delenv('RESULT_CACHE_PATH', raising=False)
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    monkeypatch.setattr(cache, '_backend', None)
+    
+    asyncio.run(cache.set('key', {'patient_name': 'Ravi Kumar'}))
+    assert asyncio.run(cache.get('key')) == {'patient_name': 'Ravi Kumar'}
+    
+    directory = tmp_path / 'medical_claim_processor'
+    assert _mode(directory) == 0o700
+    assert _mode(directory / 'result_cache.sqlite3') == 0o600
+
+def test_explicit_cache_file_is_private(monkeypatch, tmp_path):
+    path = tmp_path / 'results.sqlite3'
+    path.touch(mode=0o644)
+    os.chmod(path, 0o644)
+    monkeypatch.setenv('RESULT_CACHE_PATH', str(path))
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    monkeypatch.setattr(cache, '_backend', None)
+    
+    asyncio.run(cache.set('key', {'status': 'approved'}))
+    assert _mode(path) == 0o600
+
+def test_redis_url_selects_redis(monkeypatch):
+    monkeypatch.setenv('REDIS_URL', 'redis://localhost:6379/0')
+    monkeypatch.setattr(cache, '_backend', None)
+    assert isinstance(cache._get_backend(), cache.RedisCache)
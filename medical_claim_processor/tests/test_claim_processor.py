@@ -0,0 +1,82 @@
+import asyncio
+import io
+import os
+import signal
+
+import pytest
+from reportlab.pdfgen import canvas
+
+from src.agents.base_agent import current_claim_id
+from src.models.data_models import ClassifiedDocument
+from src.services import claim_processor
+
+def _pdf(text):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    pdf.drawString(72, 720, text)
+    pdf.save()
+    return buffer.getvalue()
+
+def _crash(pdf_bytes):
+    os._exit(1)
+
+@pytest.fixture
+def pdf_pool(monkeypatch):
+    monkeypatch.setattr(claim_processor, '_PDF_WORKERS', 1)
+    monkeypatch.setattr(claim_processor, '_pdf_pool', None)
+    yield
+    if claim_processor._pdf_pool is not None:
+        claim_processor._pdf_pool.shutdown(wait=True)
+
+def test_web_concurrency_defaults_to_one(monkeypatch):
+    monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+    assert claim_processor.web_concurrency() == 1
+    monkeypatch.setenv('WEB_CONCURRENCY', '')
+    assert claim_processor.web_concurrency() == 1
+
+def test_web_concurrency_opt_in(monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '3')
+    assert claim_processor.web_concurrency() == 3
+    monkeypatch.setenv('WEB_CONCURRENCY', 'auto')
+    assert claim_processor.web_concurrency() == (os.cpu_count() or 1)
+
+def test_pdf_pool_recovers_after_worker_dies(pdf_pool):
+    pool = claim_processor._get_pdf_pool()
+    os.kill(pool.submit(os.getpid).result(), signal.SIGKILL)
+    
+    text = asyncio.run(claim_processor.ClaimProcessor()._extract_text_from_pdf(_pdf('Total Amount Rs. 5000')))
+    assert 'Total Amount Rs. 5000' in text
+    assert claim_processor._pdf_pool is not pool
+
+def test_document_that_kills_workers_is_skipped(pdf_pool, monkeypatch):
+    read_pdf_text = claim_processor.read_pdf_text
+    processor = claim_processor.ClaimProcessor()
+    
+    monkeypatch.setattr(claim_processor, 'read_pdf_text', _crash)
+    assert asyncio.run(processor._extract_text_from_pdf(b'%PDF-1.4')) == ""
+    
+    # Later documents still get a working pool
+    monkeypatch.setattr(claim_processor, 'read_pdf_text', read_pdf_text)
+    assert 'Discharge Summary' in asyncio.run(processor._extract_text_from_pdf(_pdf('Discharge Summary')))
+
+def test_extract_data_scopes_each_claim(monkeypatch):
+    seen = []
+    
+    async def record(self, classified_doc, doc_data):
+        seen.append((classified_doc.file_id, current_claim_id.get()))
+    
+    monkeypatch.setattr(claim_processor.ClaimProcessor, '_extract_document_data', record)
+    processor = claim_processor.ClaimProcessor()
+    
+    async def run(file_ids):
+        docs = [ClassifiedDocument(file_id=file_id, document_type='hospital_bill', confidence=0.9) for file_id in file_ids]
+        await processor._extract_data(docs, [{'file_id': file_id} for file_id in file_ids])
+    
+    async def run_claims():
+        await asyncio.gather(run(['a1', 'a2']), run(['b1']))
+        return current_claim_id.get()
+    
+    assert asyncio.run(run_claims()) is None
+    claims = dict(seen)
+    assert claims['a1'] is not None and claims['a1'] == claims['a2']
+    assert claims['b1'] not in (None, claims['a1'])
@@ -0,0 +1,55 @@
+from src.agents.base_agent import BaseAgent, fold_for_keywords, keyword_date_patterns
+
+_ADMISSION = keyword_date_patterns(['admission', 'admit'])
+
+def _extract(text, patterns=_ADMISSION, folded=False):
+    agent = BaseAgent('test')
+    return agent._extract_date_pattern(text, patterns, fold_for_keywords(text) if folded else None)
+
+def test_day_first_date():
+    assert _extract('Date of Admission: 12/03/2024') == '2024-03-12'
+
+def test_earlier_format_wins_over_earlier_position():
+    text = 'Admission 5 March 2024. Admission date 2024-03-07, admission: 06/03/2024'
+    assert _extract(text) == '2024-03-06'
+
+def test_year_first_beats_verbal():
+    assert _extract('admission 5 March 2024 and admission 2024/03/07') == '2024-03-07'
+
+def test_verbal_date():
+    assert _extract('Admitted on admission 5 March 2024') == '2024-03-05'
+
+def test_first_keyword_decides():
+    # 'admission' is tried before 'admit', wherever it appears in the text
+    assert _extract('admit 01/02/2024, admission 05/06/2024') == '2024-06-05'
+
+def test_resume_after_verbal_date_swallowing_keyword():
+    # "admit 5 admit 2024" looks like a verbal date; the real date follows
+    # the second keyword and must still be found
+    assert _extract('admit 5 admit 2024/03/12') == '2024-03-12'
+
+def test_folded_text_skips_missing_keywords():
+    assert _extract('Discharge: 12/03/2024', folded=True) is None
+    assert _extract('ADMISSION: 12/03/2024', folded=True) == '2024-03-12'
+
+def test_no_date():
+    assert _extract('Admission pending') is None
+
+def test_normalize_date_forms():
+    agent = BaseAgent('test')
+    assert agent._normalize_date('2024-03-12') == '2024-03-12'
+    assert agent._normalize_date('2024/3/7') == '2024-03-07'
+    assert agent._normalize_date('12-03-2024') == '2024-03-12'
+    assert agent._normalize_date('5 Sept 2024') == '2024-09-05'
+
+def test_normalize_date_falls_back_to_month_first():
+    agent = BaseAgent('test')
+    assert agent._normalize_date('03/25/2024') == '2024-03-25'
+    # Only slashes suggest a month-first date
+    assert agent._normalize_date('03-25-2024') is None
+
+def test_normalize_date_rejects_invalid_dates():
+    agent = BaseAgent('test')
+    assert agent._normalize_date('2024-02-30') is None
+    assert agent._normalize_date('12/03-2024') is None
+    assert agent._normalize_date('5 admit 2024') is None
@@ -0,0 +1,46 @@
+import asyncio
+
+import orjson
+
+from src.models.data_models import ClaimDecision, ExtractedData, ValidationResult
+from src.services.decision_engine import DecisionEngine
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+    
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        return _Response(orjson.dumps({'status': 'approved', 'reason': f'call {self.calls}', 'confidence': 0.9}).decode())
+
+def _bill(bill_number, raw_text):
+    return ExtractedData(document_type='hospital_bill', extraction_confidence=0.9, raw_text=raw_text, data={
+        'hospital_name': 'Apollo Hospital', 'patient_name': 'Ravi Kumar', 'total_amount': 50000.0,
+        'bill_number': bill_number
+    })
+
+def _decide(engine, extracted_data):
+    rule_decision = ClaimDecision(status='approved', reason='All checks passed', confidence=0.8)
+    return asyncio.run(engine._ai_assisted_decision(extracted_data, ValidationResult(), rule_decision))
+
+def test_claims_with_the_same_summary_are_decided_separately():
+    engine = DecisionEngine()
+    engine.model = FakeModel()
+    # Bill number and text are not in the prompt summary
+    first = _decide(engine, [_bill('B-1001', 'Bill B-1001, decision cache test')])
+    second = _decide(engine, [_bill('B-2002', 'Bill B-2002, decision cache test')])
+    assert engine.model.calls == 2
+    assert first.reason != second.reason
+
+def test_retry_of_the_same_claim_reuses_the_decision():
+    engine = DecisionEngine()
+    engine.model = FakeModel()
+    claim = [_bill('B-3003', 'Bill B-3003, decision retry test')]
+    first = _decide(engine, claim)
+    second = _decide(engine, claim)
+    assert engine.model.calls == 1
+    assert first == second
@@ -0,0 +1,22 @@
+from src.services.document_classifier import DocumentClassifier
+
+def _classify(filename, text):
+    return DocumentClassifier()._rule_based_classify('file-1', filename, text)
+
+def test_no_keywords_is_other_at_low_confidence():
+    result = _classify('scan_001.pdf', 'Lorem ipsum dolor sit amet')
+    assert result.document_type == 'other'
+    assert result.confidence == 0.1
+
+def test_highest_keyword_score_wins():
+    result = _classify('upload.pdf', 'Discharge Summary. Diagnosis: fever. Admission: 12/03/2024. Total: Rs. 500')
+    assert result.document_type == 'discharge_summary'
+    assert result.confidence == 0.8
+
+def test_filename_keywords_count():
+    result = _classify('insurance_card.pdf', '')
+    assert result.document_type == 'insurance_card'
+
+def test_ties_keep_the_first_type():
+    # One keyword each for hospital_bill and discharge_summary
+    assert _classify('upload.pdf', 'invoice for patient').document_type == 'hospital_bill'
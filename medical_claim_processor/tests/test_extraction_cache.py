@@ -0,0 +1,41 @@
+import asyncio
+
+from src.agents.bill_agent import BillAgent
+
+_LLM_DATA = {
+    'hospital_name': 'Apollo Hospital', 'total_amount': 50000.0, 'patient_name': 'Ravi Kumar',
+    'date_of_service': '2024-03-12', 'insurance_company': 'Star Health', 'policy_number': 'SH123456',
+}
+
+def _agent(llm_results):
+    agent = BillAgent()
+    calls = []
+    
+    async def llm_extract(text_content, rule_data):
+        calls.append(text_content)
+        return llm_results[len(calls) - 1]
+    
+    agent._llm_extract_bill_data = llm_extract
+    return agent, calls
+
+def test_failed_llm_result_is_not_persisted():
+    text = 'Scanned bill, failed LLM then retry'
+    agent, calls = _agent([None, _LLM_DATA])
+    
+    first = asyncio.run(agent.extract_data_cached(text))
+    assert first.data.get('hospital_name') is None
+    
+    # The retry reaches the LLM again instead of the week-long cached fallback
+    second = asyncio.run(agent.extract_data_cached(text))
+    assert len(calls) == 2
+    assert second.data['hospital_name'] == 'Apollo Hospital'
+    assert second.extraction_confidence >= 0.85
+
+def test_confident_result_is_persisted():
+    text = 'Scanned bill, successful LLM'
+    agent, calls = _agent([_LLM_DATA])
+    
+    first = asyncio.run(agent.extract_data_cached(text))
+    second = asyncio.run(BillAgent().extract_data_cached(text))
+    assert len(calls) == 1
+    assert second.data == first.data
@@ -0,0 +1,129 @@
+import asyncio
+import re
+
+import orjson
+
+from src.agents.base_agent import GeminiBatcher, current_claim_id
+
+_REQUEST_RE = re.compile(r'=== Request (\S+) ===\n(.*?)\n', re.DOTALL)
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Answers combined prompts through `combined`, single prompts by echoing them."""
+    
+    def __init__(self, combined):
+        self.combined = combined
+        self.single_prompts = []
+        self.combined_prompts = []
+    
+    def generate_content(self, prompt):
+        requests = _REQUEST_RE.findall(prompt)
+        if requests:
+            self.combined_prompts.append([request_prompt for _, request_prompt in requests])
+            return _Response(self.combined(requests))
+        self.single_prompts.append(prompt)
+        return _Response(orjson.dumps({'single': prompt}).decode())
+
+def _run(model, prompts):
+    return asyncio.run(GeminiBatcher()._generate_combined(model, prompts))
+
+def _answer(prompt):
+    return {'field': prompt}
+
+def test_answers_are_split_by_key():
+    def combined(requests):
+        body = {key: {'request_key': key, **_answer(prompt)} for key, prompt in requests}
+        return 'Here you go: ' + orjson.dumps(body).decode()
+    
+    model = FakeModel(combined)
+    results = _run(model, ['bill', 'discharge', 'card'])
+    assert [orjson.loads(r) for r in results] == [_answer('bill'), _answer('discharge'), _answer('card')]
+    assert model.single_prompts == []
+
+def test_missing_answer_is_sent_on_its_own():
+    def combined(requests):
+        key, prompt = requests[0]
+        return orjson.dumps({key: {'request_key': key, **_answer(prompt)}}).decode()
+    
+    model = FakeModel(combined)
+    results = _run(model, ['bill', 'discharge'])
+    assert orjson.loads(results[0]) == _answer('bill')
+    assert orjson.loads(results[1]) == {'single': 'discharge'}
+    assert model.single_prompts == ['discharge']
+
+def test_answers_echoing_another_key_are_not_trusted():
+    def combined(requests):
+        # Each answer is filed under its own key but echoes the other one
+        (key0, prompt0), (key1, prompt1) = requests
+        return orjson.dumps({
+            key0: {'request_key': key1, **_answer(prompt1)},
+            key1: {'request_key': key0, **_answer(prompt0)},
+        }).decode()
+    
+    model = FakeModel(combined)
+    results = _run(model, ['bill', 'discharge'])
+    assert [orjson.loads(r) for r in results] == [{'single': 'bill'}, {'single': 'discharge'}]
+
+def test_answers_filed_by_position_are_not_trusted():
+    def combined(requests):
+        return orjson.dumps({str(i): _answer(prompt) for i, (_, prompt) in enumerate(requests)}).decode()
+    
+    model = FakeModel(combined)
+    results = _run(model, ['bill', 'discharge'])
+    assert sorted(model.single_prompts) == ['bill', 'discharge']
+    assert orjson.loads(results[0]) == {'single': 'bill'}
+
+def test_unparseable_response_falls_back_to_single_requests():
+    model = FakeModel(lambda requests: 'not json')
+    results = _run(model, ['bill', 'discharge'])
+    assert [orjson.loads(r) for r in results] == [{'single': 'bill'}, {'single': 'discharge'}]
+
+def test_keys_differ_between_requests():
+    seen = []
+    
+    def combined(requests):
+        seen.append([key for key, _ in requests])
+        return '{}'
+    
+    model = FakeModel(combined)
+    _run(model, ['a', 'b'])
+    _run(model, ['a', 'b'])
+    assert len(set(seen[0])) == 2
+    assert not set(seen[0]) & set(seen[1])
+
+def _keyed_answers(requests):
+    return orjson.dumps({key: {'request_key': key, **_answer(prompt)} for key, prompt in requests}).decode()
+
+def test_concurrent_claims_never_share_a_request():
+    model = FakeModel(_keyed_answers)
+    # A long window, so every prompt below lands in one batch
+    batcher = GeminiBatcher(max_wait_ms=200)
+    
+    async def claim(claim_id, prompts):
+        current_claim_id.set(claim_id)
+        return await asyncio.gather(*(batcher.submit(model, prompt) for prompt in prompts))
+    
+    async def run():
+        return await asyncio.gather(
+            claim('claim-a', ['a bill', 'a discharge']),
+            claim('claim-b', ['b bill', 'b discharge']),
+        )
+    
+    results_a, results_b = asyncio.run(run())
+    assert [orjson.loads(r) for r in results_a] == [_answer('a bill'), _answer('a discharge')]
+    assert [orjson.loads(r) for r in results_b] == [_answer('b bill'), _answer('b discharge')]
+    assert sorted(model.combined_prompts) == [['a bill', 'a discharge'], ['b bill', 'b discharge']]
+
+def test_prompts_outside_a_claim_are_sent_alone():
+    model = FakeModel(_keyed_answers)
+    batcher = GeminiBatcher(max_wait_ms=200)
+    
+    async def run():
+        return await asyncio.gather(batcher.submit(model, 'first'), batcher.submit(model, 'second'))
+    
+    results = asyncio.run(run())
+    assert [orjson.loads(r) for r in results] == [{'single': 'first'}, {'single': 'second'}]
+    assert model.combined_prompts == []
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+from src.agents import base_agent
+from src.agents.base_agent import BaseAgent, truncate_to_tokens
+
+class _CharEncoding:
+    """One token per character, standing in for cl100k_base offline."""
+    
+    def __init__(self):
+        self.encoded_lengths = []
+    
+    def encode(self, text, disallowed_special=()):
+        self.encoded_lengths.append(len(text))
+        return [ord(c) for c in text]
+    
+    def decode(self, tokens):
+        return ''.join(chr(t) for t in tokens)
+
+def test_short_text_is_unchanged(monkeypatch):
+    monkeypatch.setattr(base_agent, '_get_token_encoding', _CharEncoding)
+    assert truncate_to_tokens('short text', max_tokens=100) == 'short text'
+
+def test_long_text_is_cut_to_the_budget_from_a_prefix(monkeypatch):
+    encoding = _CharEncoding()
+    monkeypatch.setattr(base_agent, '_get_token_encoding', lambda: encoding)
+    text = 'x' * 10000
+    assert truncate_to_tokens(text, max_tokens=100) == 'x' * 100
+    # Only the max_tokens * 16 character prefix was encoded
+    assert encoding.encoded_lengths == [1600]
+
+def test_character_fallback_without_tokenizer(monkeypatch):
+    monkeypatch.setattr(base_agent, '_get_token_encoding', lambda: None)
+    assert truncate_to_tokens('y' * 1000, max_tokens=10) == 'y' * 40
+
+def test_llm_extract_truncates_off_the_event_loop(monkeypatch):
+    threads = []
+    
+    def fake_truncate(text):
+        threads.append(threading.current_thread())
+        return text
+    
+    async def fake_submit(model, prompt):
+        return '{"field": "value"}'
+    
+    class FakeModel:
+        model_name = 'fake-model'
+    
+    monkeypatch.setattr(base_agent, 'truncate_to_tokens', fake_truncate)
+    monkeypatch.setattr(base_agent._gemini_batcher, 'submit', fake_submit)
+    
+    async def run():
+        result = await BaseAgent('test')._llm_extract('Extract.', 'truncation thread test', FakeModel())
+        return result, threading.current_thread()
+    
+    result, loop_thread = asyncio.run(run())
+    assert result == {'field': 'value'}
+    assert threads and threads[0] is not loop_thread
@@ -0,0 +1,34 @@
+import pytest
+
+from src.services.validator import ClaimValidator
+
+@pytest.mark.parametrize('name1, name2', [
+    ('Apollo Hospital', 'Apollo Hospitals'),
+    ('Apollo Hospital', 'Apollo Medical Centre'),
+    ('Sir Ganga Ram Hospital', 'Sir Gangaram Hospital'),
+])
+def test_hospital_aliases_match(name1, name2):
+    assert ClaimValidator()._hospital_names_match([name1, name2])
+
+@pytest.mark.parametrize('name1, name2', [
+    ('City Hospital', 'New City Hospital'),
+    ('Fortis Hospital', 'Fortis Escorts Hospital'),
+    ('Apollo Hospital', 'Max Hospital'),
+])
+def test_hospitals_sharing_words_do_not_match(name1, name2):
+    assert not ClaimValidator()._hospital_names_match([name1, name2])
+
+@pytest.mark.parametrize('name1, name2', [
+    ('HDFC ERGO General Insurance', 'HDFC Ergo'),
+    ('ICICI Lombard General Insurance Co. Ltd', 'ICICI Lombard'),
+    ('Star Health and Allied Insurance', 'Star Health & Allied Insurance Co. Ltd'),
+])
+def test_insurer_aliases_match(name1, name2):
+    assert ClaimValidator()._insurance_companies_match(name1, name2)
+
+@pytest.mark.parametrize('name1, name2', [
+    ('Star Health', 'Star Health Max'),
+    ('Care Health Insurance', 'Niva Bupa Health Insurance'),
+])
+def test_insurers_sharing_words_do_not_match(name1, name2):
+    assert not ClaimValidator()._insurance_companies_match(name1, name2)